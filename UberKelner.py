@@ -4,10 +4,13 @@
 # simulation controller:
 
 import datetime
+import functools
 import os
 from random import shuffle
 from argparse import ArgumentParser
 from scripts.waiter import *
+from scripts.fleet import *
+from scripts.dataset import *
 import pygame
 from pygame.locals import *
 import time
@@ -17,28 +20,12 @@ os.environ['SDL_AUDIODRIVER'] = 'dsp'
 
 # filename __init__ is required to treat scripts folder as resource
 # variables:
-# size of sprites in px
+# size of sprites in px (sprites are initialized by init_graphics of scripts/graphics.py)
 blocksize = 60
 # graphics control
 graphics = False
 
 
-# init sprite sprite_name on coordinate x, y
-def init_graphics(self, a, b, sprite_name):
-    # \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
-    # init graphics - do not touch!
-    pygame.sprite.Sprite.__init__(self)
-    # set image
-    self.image = pygame.image.load(path.join('images', sprite_name + '.png'))
-    # resize image to blocksize
-    self.image = pygame.transform.scale(self.image, (blocksize, blocksize))
-    # set coordinates
-    self.rect = self.image.get_rect()
-    self.rect.x = a * blocksize
-    self.rect.y = b * blocksize
-    # //////////////////////////////////////////////////
-
-
 # generate random positions list for all objects
 def create_random_coordinates():
     # list of all possible numbers of coordinate
@@ -75,6 +62,12 @@ if __name__ == '__main__':
     # --graphics True
     parser.add_argument("-g", "--graphics", help="enable/disable use of graphics window and controls",
                         required=False, default=True, type=bool)
+    # --cache True
+    parser.add_argument("-k", "--cache", help="enable/disable cache of solutions (kept in data/cache)",
+                        required=False, default=True, type=bool)
+    # --jobs 4
+    parser.add_argument("-j", "--jobs", help="set number of processes creating datamodel (number of cores by default)",
+                        required=False, default=None, type=int)
     # --log -1
     parser.add_argument("-l", "--log", help="choose row of document to read simulation",
                         required=False, default=-1, type=int)
@@ -88,11 +81,24 @@ if __name__ == '__main__':
     parser.add_argument("-r", "--random", help="create random simulation with parameters: "
                                                "N num_tables num_furnaces num_walls",
                         required=False, default=False, type=bool)
-    # --solution depthfs/breathfs/bestfs/all
+    # --ordering exact/exhaustive/anytime/annealing
+    parser.add_argument("-o", "--ordering",
+                        help="choose goal ordering method.\nMethods available: exact, exhaustive, anytime, annealing.\n"
+                             "Anytime methods improve order of goals until time budget runs out.",
+                        required=False, default="exact", type=str)
+    # --solution depthfs/breathfs/bestfs/astar/hpastar/jps/alt/all
     parser.add_argument("-s", "--solution",
-                        help="choose solving method.\nMethods available: depthfs, breathfs, bestfs, all. \n"
+                        help="choose solving method.\nMethods available: depthfs, breathfs, bestfs, astar, hpastar, "
+                             "jps, alt, all. \nall races all methods in parallel until deadline (--time).\n"
                              "rabbit, svm, dtree.\nDeep-first search is the default choice.",
                         required=False, default="depthfs", type=str)
+    # --time 1.0
+    parser.add_argument("-t", "--time", help="set time budget of anytime goal ordering and deadline of "
+                                                 "portfolio solving (in seconds)",
+                        required=False, default=1.0, type=float)
+    # --waiters 1
+    parser.add_argument("-w", "--waiters", help="set number of waiters serving restaurant together",
+                        required=False, default=1, type=int)
 
     # args will be a dictionary containing the arguments
     args = vars(parser.parse_args())
@@ -104,21 +110,32 @@ if __name__ == '__main__':
     # row in simulation log to load - coordinates like in list, negative numbers mean positipon from the back of list
     run_simulation = args['log']
     model = args['model']
+    jobs = args['jobs']
     # amount of blocks in row of simulation
     N = args['size']
     solution = args['solution']
+    ordering = args['ordering']
+    budget = args['time']
+    waiters = args['waiters']
+    # cache of solutions shared by all waiters
+    cache = PathCache(path.join('data', 'cache')) if args['cache'] else None
 
     print("Args: Set autorun to %s" % args['autorun'])
     print("Args: Set blocksize to %s" % blocksize)
+    print("Args: Set cache to %s" % args['cache'])
     print("Args: Set capture to %s" % args['capture'])
     print("Args: Set document to %s" % simulation_log)
     print("Args: Set FPS to %s" % FPS)
     print("Args: Set graphics to %s" % args['graphics'])
+    print("Args: Set jobs to %s" % jobs)
     print("Args: Set model to %s" % args['model'])
     print("Args: Set simulation log to %s" % run_simulation)
     print("Args: Set size to %s" % N)
     # print("Args: Set random to %s" % args['random'])
     print("Args: Set solution to %s" % solution)
+    print("Args: Set ordering to %s" % ordering)
+    print("Args: Set time to %s" % budget)
+    print("Args: Set waiters to %s" % waiters)
 
     # default settings
     # number of tables
@@ -132,6 +149,7 @@ if __name__ == '__main__':
     if model:
         print("Model: model creation executed...")
         counter = 0
+        failed = 0
 
         # add header for scikit model
         header = "move, "
@@ -141,54 +159,29 @@ if __name__ == '__main__':
         with open(path.join('data', 'datamodel_scikit.txt'), "w") as myfile:
             myfile.write(header + '\n')
 
-        # for all files in logs:
+        # simulations of all lines of all files in logs are shared out to processes,
+        # their samples are written in order of files and lines
         # for file in os.listdir(path.join('logs', 'temp')):
-        for file in os.listdir(path.join('logs')):
-            print("Model: calculating %s..." % file)
-            # read file:
-            if file.endswith(".txt"):
-                with open(path.join('logs', file)) as f:
-                    lines = f.readlines()
-                    # for every log:
-                    for log in lines:
-                        if len(log) > 1:
-                            print("\t for line %s..." % str(lines.index(log)+1))
-                            try:
-                                log = log.split('\t')
-                                # reload simulation state from log:
-                                # amount of blocks in row of simulation - not currently active, change init
-                                N = int(log[1])
-                                # number of tables
-                                num_tables = int(log[2])
-                                # number of furnaces
-                                num_furnaces = int(log[3])
-                                # number of walls
-                                num_walls = int(log[4])
-                                # coordinates
-                                _ = log[5].replace('[', '').split('],')
-                                coordinates = [list(map(int, s.replace(']', '').split(','))) for s in _]
-
-                                # calculate simulation solution
-                                Uber = Waiter(N, coordinates, num_tables, num_furnaces, num_walls, solution)
-
-                                # run simulation:
-                                while Uber.path:
-                                    # parse neighbourhood with movement and save to datamodel
-                                    Uber.parse_neighbourhood_to_model()
-                                    # move agent on path
-                                    Uber.next_round(K_SPACE)
-
-                                del Uber
-
-                                counter = counter + 1
-                            except Exception as e:
-                                # error occures when there are no elements of one kind
-                                # (for example, map with no furnaces) therefore leaving empty list in log
-                                print(e)
-                        else:
-                            print("\t encountered empty line (%s)" % str(lines.index(log)+1))
-                f.close()
-                print("Model: calculation of %s file completed." % file)
+        scenarios = read_scenarios(path.join('logs'))
+        print("Model: calculating %s lines of logs in %s processes..." % (len(scenarios), jobs or os.cpu_count()))
+        simulate = functools.partial(Waiter.model_samples, solving_method=solution, ordering=ordering, budget=budget,
+                                     cache=cache)
+        with open(path.join('data', 'datamodel_rabbit.txt'), "a") as rabbit_file, \
+                open(path.join('data', 'datamodel_scikit.txt'), "a") as scikit_file:
+            for file, number, samples, error in generate(scenarios, simulate, jobs):
+                if samples is None:
+                    print("\t encountered empty line (%s of %s)" % (number, file))
+                    continue
+                if error is not None:
+                    print("\t line %s of %s: %s" % (number, file, error))
+                    failed = failed + 1
+                    continue
+                # save neighbourhoods with movement solutions to datamodels
+                for rabbit_standard, scikit_standard in samples:
+                    rabbit_file.write(rabbit_standard + '\n')
+                    scikit_file.write(scikit_standard + '\n')
+                counter = counter + 1
+        print("Model: %s simulations calculated, %s failed." % (counter, failed))
         print("Model: datamodel controller execution complete.")
         exit(0)
 
@@ -222,8 +215,11 @@ if __name__ == '__main__':
                          + str(coordinates[:(num_tables + num_furnaces + num_walls + 1)]) + '\n')
 
     # waiters - agents of simulation, owning matrices of restaurants
-    # one special playable waiter
-    Uber = Waiter(N, coordinates, num_tables, num_furnaces, num_walls, solution)
+    # one special playable waiter, or fleet of waiters sharing one restaurant (arrows move the first of them)
+    if waiters > 1:
+        Uber = Fleet(N, coordinates, num_tables, num_furnaces, num_walls, waiters, solution, ordering, budget)
+    else:
+        Uber = Waiter(N, coordinates, num_tables, num_furnaces, num_walls, solution, ordering, budget, cache)
 
     # main game loop:
     # check if graphics are enabled
@@ -231,8 +227,8 @@ if __name__ == '__main__':
         # graphics init
         # list of all sprites for graphics window to draw
         all_sprites = pygame.sprite.Group()
-        # add waiter to sprites list
-        all_sprites.add(Uber)
+        # add waiters to sprites list
+        all_sprites.add(Uber.waiters if waiters > 1 else Uber)
         # add all tables and furnaces to sprites list
         for _ in Uber.restaurant.all_objects_to_list():
             all_sprites.add(_)
@@ -305,6 +301,11 @@ if __name__ == '__main__':
             pygame.display.flip()
             fpsClock.tick(FPS)
 
+        # stop predictors of waiters
+        Uber.close()
         print("Main: simulation controller execution complete.")
         pygame.quit()
         sys.exit()
+    else:
+        # stop predictors of waiters
+        Uber.close()
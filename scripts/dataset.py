@@ -0,0 +1,55 @@
+# dataset of learned policies:
+# samples of data models (data/datamodel_rabbit.txt, data/datamodel_scikit.txt) generated from simulation logs.
+# Scenarios (lines of logs) are shared out to pool of worker processes - every worker simulates its scenarios
+# and keeps their samples in its own buffer. Buffers are merged in order of files and lines, so data models
+# do not depend on number of workers. Functions of this file are pure, so they can run in any process.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+# scenarios of all logs (.txt files) of directory in order of files and lines - list of (file, number of line, line),
+# empty lines are kept, so they can be reported
+def read_scenarios(directory):
+    scenarios = []
+    for file in sorted(os.listdir(directory)):
+        if file.endswith(".txt"):
+            with open(os.path.join(directory, file)) as f:
+                scenarios.extend((file, number, line) for number, line in enumerate(f, 1))
+    return scenarios
+
+
+# scenario of line of simulation log - size of restaurant, number of tables, furnaces and walls, coordinates
+def parse_scenario(line):
+    log = line.split('\t')
+    _ = log[5].replace('[', '').split('],')
+    coordinates = [list(map(int, s.replace(']', '').split(','))) for s in _]
+    return int(log[1]), int(log[2]), int(log[3]), int(log[4]), coordinates
+
+
+# worker of pool - samples of scenario simulated with simulate(scenario) and error (None if there was none)
+def solve_scenario(task):
+    simulate, line = task
+    try:
+        return simulate(parse_scenario(line)), None
+    except (Exception, SystemExit) as e:
+        # error occures when there are no elements of one kind
+        # (for example, map with no furnaces) therefore leaving empty list in log
+        return [], str(e)
+
+
+# samples of all scenarios (list of (file, number of line, line)) simulated with simulate(scenario) by pool
+# of processes (number of cores by default), yields file, number of line, samples and error of every scenario
+# in order of scenarios (samples are None for empty lines) - workers take chunks of scenarios, but their buffers
+# are merged in order. Workers of executor are not daemonic, so exhaustive ordering and portfolio can start
+# their own processes inside them
+def generate(scenarios, simulate, processes=None, chunk=1):
+    tasks = [(simulate, line) for _, _, line in scenarios if len(line) > 1]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = executor.map(solve_scenario, tasks, chunksize=chunk)
+        for file, number, line in scenarios:
+            if len(line) > 1:
+                samples, error = next(results)
+            else:
+                samples, error = None, None
+            yield file, number, samples, error
@@ -0,0 +1,96 @@
+# distance table object class:
+# distances and shortest paths between sources (waiter start and goals),
+# calculated once with one breadth-first flood per source and kept in flat integer arrays
+
+from array import array
+
+
+class DistanceTable:
+    # init table from grid graph (as returned by Matrix.to_compact_graph) and list of source cells
+    def __init__(self, graph, sources):
+        self.graph = graph
+        self.sources = list(sources)
+        self.size = graph.size
+
+        # row r of flat matrices holds distances and predecessors of all cells in flood from source r,
+        # -1 marks cells which can not be reached
+        self.distances = array('i', [-1]) * (self.size * len(self.sources))
+        self.parents = array('i', [-1]) * (self.size * len(self.sources))
+        for row in range(len(self.sources)):
+            self.flood(row)
+
+    # breadth-first flood from source of given row
+    def flood(self, row):
+        self.graph.flood(self.sources[row], self.distances, self.parents, row * self.size)
+
+    # repair table after change of cell in graph - only floods which reached the cell or its neighbours
+    # can change, so only they are calculated again; returns list of repaired rows
+    def repair(self, cell):
+        around = self.graph.around(cell)
+        rows = [row for row in range(len(self.sources)) if any(self.distance(row, c) != -1 for c in around)]
+        for row in rows:
+            offset = row * self.size
+            self.distances[offset:offset + self.size] = array('i', [-1]) * self.size
+            self.parents[offset:offset + self.size] = array('i', [-1]) * self.size
+            self.flood(row)
+        return rows
+
+    # length of the shortest path between sources a and b (indexes of rows), -1 if there is no path
+    def cost(self, a, b):
+        return self.distance(b, self.sources[a])
+
+    # length of the shortest path from any cell to source of given row, -1 if there is no path
+    def distance(self, row, cell):
+        return self.distances[row * self.size + cell]
+
+    # shortest path from any cell to source of given row as list of cells, empty list if there is no path
+    # flood of every source is a distance field - predecessors lead from any cell straight to the source
+    def path_from(self, row, cell):
+        if self.distance(row, cell) == -1:
+            return []
+        offset = row * self.size
+        path = [cell]
+        while cell != self.sources[row]:
+            cell = self.parents[offset + cell]
+            path.append(cell)
+        return path
+
+    # shortest path between sources a and b as list of cells from a to b, empty list if there is no path
+    def leg(self, a, b):
+        return self.path_from(b, self.sources[a])
+
+    # matrix of distances between all sources, unreachable pairs are given cost passed as argument
+    def matrix(self, unreachable):
+        matrix = [[0 for _ in self.sources] for _ in self.sources]
+        for a in range(len(self.sources)):
+            for b in range(len(self.sources)):
+                if a != b:
+                    cost = self.cost(a, b)
+                    matrix[a][b] = cost if cost != -1 else unreachable
+        return matrix
+
+    # legs between fields goals are served from, for ordering goals of rows (the first row is start) - waiter stays
+    # on the field he reached goal from, so the leg to the next goal depends on side of the previous goal.
+    # Returns goal (index in rows) of every field (field 0 is start), costs of legs from every field to every goal
+    # and fields where legs end (-1 if there is no leg)
+    def serving(self, rows, unreachable):
+        cells = [self.sources[rows[0]]]
+        goals = [0]
+        fields = {(0, cells[0]): 0}
+        costs = []
+        arrivals = []
+        field = 0
+        while field < len(cells):
+            costs.append([0] + [unreachable] * (len(rows) - 1))
+            arrivals.append([-1] * len(rows))
+            for goal in range(1, len(rows)):
+                path = self.path_from(rows[goal], cells[field]) if goal != goals[field] else []
+                if len(path) > 1:
+                    if (goal, path[-2]) not in fields:
+                        fields[(goal, path[-2])] = len(cells)
+                        cells.append(path[-2])
+                        goals.append(goal)
+                    costs[field][goal] = len(path) - 1
+                    arrivals[field][goal] = fields[(goal, path[-2])]
+            field += 1
+        return goals, costs, arrivals
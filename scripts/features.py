@@ -0,0 +1,87 @@
+# feature encoder object class:
+# neighbourhoods of waiters as rows of features for learned policies, without building any strings.
+# Symbols of all fields of restaurant are kept in numpy grid padded with walls - only rows of matrix changed
+# since previous snapshot are encoded again. Neighbourhoods are sliced straight out of the grid and mapped
+# through lookup table of values of symbols.
+
+import numpy
+from numpy.lib.stride_tricks import sliding_window_view
+
+from scripts.matrix import *
+from scripts.rabbit import *
+
+# symbols of neighbourhood (like in data models, see documentation/unsupervised_learning.txt) and their codes
+SYMBOLS = {"_": 0, "X": 1, "F": 2, "E": 3, "T": 4, "Y": 5, "W": 6}
+# values of symbols in data models - other objects are treated as walls
+VALUES = numpy.array([0, 1, 20, 21, 30, 31, 4, 1], dtype=numpy.float32)
+# symbol of every type of cell (CELL_*), for inactive and active objects
+CELL_SYMBOLS = numpy.array([[0, 0], [6, 6], [4, 5], [2, 3], [1, 1], [7, 7]], dtype=numpy.uint8)
+
+
+class FeatureEncoder:
+    # init encoder of square neighbourhoods of given size
+    def __init__(self, size=5):
+        self.size = size
+        self.shift = (size - 1) // 2
+        # names of features of rabbit data model - row x column of neighbourhood
+        self.names = ["{}x{}".format(row, column) for row in range(size) for column in range(size)]
+        # padded grid of symbols and snapshot of matrix it was encoded from
+        self.symbols = None
+        self.snapshot = None
+
+    # grid of symbols of matrix, padded with walls, updated only in rows changed since previous call
+    def grid(self, matrix):
+        snapshot = matrix.snapshot()
+        if self.symbols is None or self.symbols.shape[0] != len(snapshot.cells) + 2 * self.shift:
+            self.symbols = numpy.full((len(snapshot.cells) + 2 * self.shift, len(snapshot.cells[0]) + 2 * self.shift),
+                                      SYMBOLS["X"], dtype=numpy.uint8)
+            self.snapshot = None
+        if snapshot is not self.snapshot:
+            for x, (cells, states) in enumerate(zip(snapshot.cells, snapshot.states)):
+                # rows of snapshots which did not change are shared
+                if self.snapshot is not None and cells is self.snapshot.cells[x] and states is self.snapshot.states[x]:
+                    continue
+                self.symbols[x + self.shift, self.shift:-self.shift or None] = \
+                    CELL_SYMBOLS[numpy.frombuffer(cells, dtype=numpy.uint8),
+                                 numpy.minimum(numpy.frombuffer(states, dtype=numpy.uint8), 1)]
+            self.snapshot = snapshot
+        return self.symbols
+
+    # symbols of neighbourhoods of positions (list of [x, y]) as array of shape (positions, size * size) -
+    # feature row * size + column is field [x + column - shift, y + row - shift], like in data models.
+    # Neighbourhoods are seen by waiter standing on [x, y] - if waiter (his coordinates) is given, he is moved
+    # from his field to the middle of every neighbourhood, like in all samples of data models
+    def windows(self, matrix, positions, waiter=None):
+        positions = numpy.asarray(positions, dtype=numpy.intp).reshape(-1, 2)
+        windows = sliding_window_view(self.grid(matrix), (self.size, self.size))[positions[:, 0], positions[:, 1]]
+        windows = numpy.ascontiguousarray(windows.transpose(0, 2, 1)).reshape(len(positions), self.size * self.size)
+        if waiter is not None:
+            column = waiter[0] - positions[:, 0] + self.shift
+            row = waiter[1] - positions[:, 1] + self.shift
+            inside = (column >= 0) & (column < self.size) & (row >= 0) & (row < self.size)
+            windows[inside, row[inside] * self.size + column[inside]] = SYMBOLS["_"]
+            windows[:, self.shift * self.size + self.shift] = SYMBOLS["W"]
+        return windows
+
+    # contiguous float32 rows of features of neighbourhoods of positions, values of symbols multiplied by scale
+    # (svm and dtree models were trained on values divided by 100)
+    def encode(self, matrix, positions, scale=0.01, waiter=None):
+        return numpy.ascontiguousarray(VALUES[self.windows(matrix, positions, waiter)] * numpy.float32(scale))
+
+    # neighbourhoods of positions (list of [x, y]) packed to integers - 3 bits per field
+    def keys(self, matrix, positions, waiter=None):
+        windows = self.windows(matrix, positions, waiter)
+        bits = numpy.unpackbits(windows[:, :, None], axis=2)[:, :, 5:].reshape(len(windows), -1)
+        return [int.from_bytes(row.tobytes(), 'big') for row in numpy.packbits(bits, axis=1)]
+
+    # neighbourhood of position packed to one integer
+    def key(self, matrix, x, y):
+        return self.keys(matrix, [(x, y)])[0]
+
+    # example of rabbit data model for row of features (not scaled), for example "| 0x0:1 0x1:4 ..."
+    def example(self, row):
+        return vw_example(self.names, row)
+
+    # sample of scikit data model for row of features (not scaled), for example "1, 4, ..., 1, "
+    def sample(self, row):
+        return "".join("{}, ".format(int(value)) for value in row)
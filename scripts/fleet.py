@@ -0,0 +1,359 @@
+# fleet object class:
+# several waiters serving one shared restaurant. Goals are assigned to waiters greedily (every next goal goes
+# to the waiter which can serve it the earliest), order of goals of every waiter is solved by goal ordering engine
+# and collision-free paths are planned one waiter after another with space-time A* over table of reservations
+# (prioritized planning) - there is no joint search of all waiters, so the fleet scales to tens of waiters.
+
+import heapq
+import time
+from collections import deque
+
+from pygame.locals import *
+
+from scripts.matrix import *
+from scripts.grid_graph import *
+from scripts.distance_table import *
+from scripts.ordering import *
+
+
+class Fleet:
+    # initialize fleet of num_waiters waiters in one restaurant - the first waiter stands on the first coordinates
+    # of matrix_fields, the others on free fields nearest to him
+    def __init__(self, n, matrix_fields, num_tables, num_furnaces, num_walls, num_waiters, solving_method,
+                 ordering="exact", budget=1.0):
+        # waiter is imported here - fleet does not depend on it at import time
+        from scripts.waiter import Waiter
+        print("Fleet: initializing %s waiters..." % num_waiters)
+        self.n = n
+        self.restaurant = Matrix(n, n)
+        Waiter.furnish(self.restaurant, matrix_fields, num_tables, num_furnaces, num_walls)
+        self.graph = self.restaurant.to_compact_graph()
+
+        positions = [matrix_fields[0]] + self.free_fields(matrix_fields[0], num_waiters - 1)
+        if len(positions) < num_waiters:
+            print("Fleet: only %s free fields for waiters!" % len(positions))
+        self.waiters = [Waiter(n, [position] + matrix_fields[1:], num_tables, num_furnaces, num_walls,
+                               solving_method, ordering, budget, restaurant=self.restaurant)
+                        for position in positions]
+        self.objects_coordinates = self.waiters[0].objects_coordinates
+
+        # reservations of fields in time: (cell, time) -> waiter, the latest reservation of every field by every
+        # waiter and fields where waiters stay after their work
+        self.reservations = dict()
+        self.latest = dict()
+        self.parked = dict()
+        # goals assigned to every waiter, in order of visiting
+        self.assignment = []
+        # set when waiter was moved manually - paths of the whole fleet are planned again
+        self.control = True
+        # number of goals left when paths ran out and the fleet was planned again - goals skipped before
+        # are tried once more, goals which the next attempt does not serve are given up
+        self.retried = None
+        self.abandoned = []
+        self.steps_count = 0
+
+        self.plan()
+        print("Fleet: initialization completed.")
+
+    # free floor fields nearest to coordinates (breadth-first), for additional waiters
+    def free_fields(self, coordinates, count):
+        start = self.graph.cell(coordinates[0], coordinates[1])
+        visited = {start}
+        queue = deque([start])
+        fields = []
+        while queue and len(fields) < count:
+            vertex = queue.popleft()
+            for next_ in self.graph.adjacent(vertex):
+                if next_ not in visited and self.graph.passable[next_] == FLOOR:
+                    visited.add(next_)
+                    queue.append(next_)
+                    if self.restaurant.is_empty(*self.graph.coordinates(next_)):
+                        fields.append(self.graph.coordinates(next_))
+        return fields[:count]
+
+    # goals still waiting for service
+    @property
+    def goals(self):
+        return [goal for goal in self.objects_coordinates if goal not in self.abandoned
+                and getattr(self.restaurant.get(goal[0], goal[1]), 'state', 0) != 0]
+
+    # the longest of paths of waiters - the fleet has work to do as long as it is not empty
+    @property
+    def path(self):
+        return max((waiter.path for waiter in self.waiters), key=len)
+
+    # //////////////////////////////////////////////////
+    #           P L A N N I N G
+
+    # assign goals waiting for service to waiters and plan their collision-free paths from current positions
+    def plan(self):
+        starttime = time.time()
+        goals = self.goals
+        starts = [self.graph.cell(waiter.x, waiter.y) for waiter in self.waiters]
+        table = DistanceTable(self.graph, starts + [self.graph.cell(x, y) for x, y in goals])
+        opened = [self.open_fields(index, starts) for index in range(len(starts))]
+        self.assignment = self.assign(table, len(self.waiters), opened)
+
+        # waiters with the longest routes are planned first, waiters without goals are planned last
+        # and only step aside when the others need their fields
+        priority = sorted(range(len(self.waiters)),
+                          key=lambda index: (len(self.assignment[index]) == 0, -self.route_cost(table, index)))
+        # waiters who were blocked by the others are planned first in next attempt, the attempt
+        # with the fewest blocked waiters is kept
+        best = None
+        for attempt in range(len(self.waiters)):
+            paths, skipped = self.plan_all(priority, table, starts)
+            failed = sorted(set(index for index, row in skipped
+                                if row is None or table.distance(row, starts[index]) != -1))
+            if best is None or len(failed) < best[0]:
+                best = (len(failed), paths, skipped)
+            if not failed:
+                break
+            priority = failed + [index for index in priority if index not in failed]
+        paths, skipped = best[1:]
+        for index, row in skipped:
+            if row is None:
+                print("Fleet: waiter %s has no free field to stay on" % index)
+            else:
+                print("Fleet: waiter %s can not reach %s, goal skipped"
+                      % (index, self.graph.coordinates(table.sources[row])))
+        served = -len([row for index, row in skipped if row is not None])
+        for index, waiter in enumerate(self.waiters):
+            cells = paths[index]
+            waiter.goal_order = [goals[row - len(starts)] for row in self.assignment[index]]
+            waiter.path = waiter.calculate_vector_movement(waiter.parse_cells_list([cells])) if len(cells) > 1 else []
+            served += len(self.assignment[index])
+        self.control = True
+        print("Fleet: %s goals assigned to %s waiters, planned in {0:.2f} seconds, "
+              "the longest path contains %s steps.".format(time.time() - starttime)
+              % (served, len(self.waiters), len(self.path)))
+
+    # plan paths of all waiters in order of priority, returns paths (lists of cells) of waiters
+    # and list of pairs (waiter, row of distance table) of goals which could not be reached
+    def plan_all(self, priority, table, starts):
+        self.reservations = dict()
+        self.latest = dict()
+        self.parked = dict()
+        # waiters stay on their fields at the beginning
+        for index, start in enumerate(starts):
+            self.reserve(index, start, 0)
+        paths = dict()
+        skipped = []
+        for index in priority:
+            paths[index], skipped_rows = self.plan_waiter(index, table, starts[index])
+            skipped += [(index, row) for row in skipped_rows]
+        return paths, skipped
+
+    # floor fields which waiter reaches without passing fields of the other waiters (breadth-first)
+    def open_fields(self, index, starts):
+        blocked = set(starts) - {starts[index]}
+        visited = {starts[index]}
+        queue = deque([starts[index]])
+        while queue:
+            vertex = queue.popleft()
+            for next_ in self.graph.adjacent(vertex):
+                if next_ not in visited and next_ not in blocked and self.graph.passable[next_] == FLOOR:
+                    visited.add(next_)
+                    queue.append(next_)
+        return visited
+
+    # greedy assignment of goals (rows of distance table after waiters) - every next goal is the one which can be
+    # served the earliest, by the waiter who would serve it; then order of goals of every waiter is solved again.
+    # Goal which some waiters reach without passing the others (fields in opened) goes to one of them - waiters
+    # can not pass each other in narrow corridors
+    def assign(self, table, count, opened):
+        routes = [[] for _ in range(count)]
+        ends = list(range(count))
+        costs = [0] * count
+        unassigned = set(range(count, len(table.sources)))
+        openers = {row: [index for index in range(count)
+                         if opened[index] & set(self.graph.adjacent(table.sources[row]))]
+                   for row in unassigned}
+        while unassigned:
+            # distances between goals are measured through tables, so reachability is checked from waiter himself
+            candidates = [(costs[index] + table.cost(ends[index], row), index, row)
+                          for index in range(count) for row in unassigned
+                          if table.cost(index, row) != -1 and table.cost(ends[index], row) != -1
+                          and (not openers[row] or index in openers[row])]
+            if not candidates:
+                print("Fleet: goals unreachable for all waiters, skipped: %s"
+                      % [self.graph.coordinates(table.sources[row]) for row in sorted(unassigned)])
+                break
+            cost, index, row = min(candidates)
+            routes[index].append(row)
+            ends[index] = row
+            costs[index] = cost
+            unassigned.remove(row)
+        for index, route in enumerate(routes):
+            if 1 < len(route) <= HELD_KARP_LIMIT:
+                rows = [index] + route
+                distances = [[table.cost(a, b) if a != b else 0 for b in rows] for a in rows]
+                order = solve_order(distances, serving=table.serving(rows, UNREACHABLE))
+                routes[index] = [route[goal - 1] for goal in order]
+        return routes
+
+    # cost of route of waiter in distance table
+    def route_cost(self, table, index):
+        rows = [index] + self.assignment[index]
+        return sum(table.cost(a, b) for a, b in zip(rows, rows[1:]))
+
+    # plan path of waiter through his goals, avoiding fields reserved by waiters planned before him,
+    # returns list of coordinates (cells) - one per step, with served goals between two visits of the same field,
+    # and list of rows of goals which could not be reached (None when there was no field to stay on after work)
+    def plan_waiter(self, index, table, start):
+        cells = [start]
+        skipped = []
+        time_ = 0
+        standing = start
+        for row in self.assignment[index]:
+            leg = self.plan_leg(index, table, row, standing, time_)
+            if not leg:
+                skipped.append(row)
+                continue
+            self.reserve_leg(index, leg, time_)
+            time_ += len(leg) - 1
+            standing = leg[-1]
+            # serving takes one step - waiter stays on his field
+            time_ += 1
+            self.reserve(index, standing, time_)
+            cells.extend(leg[1:] + [table.sources[row], standing])
+        # waiter who would stand in the way of the others steps aside
+        if not self.parkable(index, standing, time_):
+            leg = self.plan_parking(index, standing, time_)
+            if leg:
+                self.reserve_leg(index, leg, time_)
+                time_ += len(leg) - 1
+                standing = leg[-1]
+                cells.extend(leg[1:])
+            else:
+                skipped.append(None)
+        # waiter stays on his last field
+        self.reserve(index, standing, time_)
+        self.parked[standing] = (time_, index)
+        return cells, skipped
+
+    # reserve field for waiter in time
+    def reserve(self, index, cell, time_):
+        self.reservations[(cell, time_)] = index
+        latest = self.latest.setdefault(cell, dict())
+        latest[index] = max(latest.get(index, time_), time_)
+
+    # reserve fields of leg for waiter, the first one in given time
+    def reserve_leg(self, index, leg, start_time):
+        for step, cell in enumerate(leg):
+            self.reserve(index, cell, start_time + step)
+
+    # check if waiter may stand on field in time - no other waiter may stand there one step before, at the same time
+    # or one step after, so waiters never swap places nor follow each other and can move in any order
+    def free(self, index, cell, time_):
+        for moment in (time_ - 1, time_, time_ + 1):
+            if self.reservations.get((cell, moment), index) != index:
+                return False
+        parked = self.parked.get(cell)
+        return parked is None or parked[1] == index or time_ + 1 < parked[0]
+
+    # check if waiter may stay on field forever from given time on
+    def parkable(self, index, cell, time_):
+        return all(other == index or moment < time_ - 1 for other, moment in self.latest.get(cell, dict()).items())
+
+    # space-time A* from standing field in given time to any field next to goal (row of distance table), from which
+    # the goal can be served - distance of goal's flood is the heuristic
+    # returns list of cells, one per step, or empty list if there is no path within time limit
+    def plan_leg(self, index, table, row, standing, start_time):
+        goal = table.sources[row]
+        targets = set(next_ for next_ in self.graph.adjacent(goal) if self.graph.passable[next_] == FLOOR)
+        if table.distance(row, standing) == -1 or not targets:
+            return []
+        # time limit - plenty of waiting, but no endless search when goal is blocked by other waiters
+        limit = start_time + 4 * (table.distance(row, standing) + self.n) + 20
+        return self.space_time_search(index, standing, start_time, limit,
+                                      lambda cell: table.distance(row, cell) - 1,
+                                      lambda cell, time_: cell in targets and self.free(index, cell, time_ + 1))
+
+    # the nearest (in time) field where waiter may stay forever, reached from standing field in given time
+    def plan_parking(self, index, standing, start_time):
+        limit = start_time + 4 * self.n + 20
+        return self.space_time_search(index, standing, start_time, limit, lambda cell: 0,
+                                      lambda cell, time_: self.parkable(index, cell, time_))
+
+    # A* in space and time over floor fields not reserved by other waiters - waiting is allowed,
+    # fields with negative heuristic can not be reached; returns list of cells from standing field
+    # to the first accepted one, one per step, or empty list if there is none within time limit
+    def space_time_search(self, index, standing, start_time, limit, heuristic, accept):
+        parents = dict()
+        closed = set()
+        queue = [(heuristic(standing), start_time, standing)]
+        while queue:
+            (f_score, time_, vertex) = heapq.heappop(queue)
+            if (vertex, time_) in closed:
+                continue
+            closed.add((vertex, time_))
+            if accept(vertex, time_):
+                leg = [vertex]
+                while (vertex, time_) != (standing, start_time):
+                    vertex, time_ = parents[(vertex, time_)]
+                    leg.append(vertex)
+                leg.reverse()
+                return leg
+            if time_ >= limit:
+                continue
+            for next_ in [vertex] + self.graph.adjacent(vertex):
+                if (next_, time_ + 1) in closed or self.graph.passable[next_] != FLOOR \
+                        or heuristic(next_) < 0 or not self.free(index, next_, time_ + 1):
+                    continue
+                parents[(next_, time_ + 1)] = (vertex, time_)
+                heapq.heappush(queue, (time_ + 1 + heuristic(next_), time_ + 1, next_))
+        return []
+
+    # //////////////////////////////////////////////////
+    #           S I M U L A T I O N
+
+    # next round of simulation - arrows move the first waiter, space moves all waiters along their paths
+    # (after manual move the paths of the whole fleet are planned again)
+    def next_round(self, key):
+        if key in (K_RIGHT, K_LEFT, K_DOWN, K_UP):
+            self.control = False
+            # after manual moves goals given up may be reachable again
+            self.retried = None
+            self.abandoned = []
+            self.waiters[0].next_round(key)
+        if key == K_SPACE:
+            replanned = not self.control
+            # paths ran out but goals are left - the fleet is planned again from current positions
+            if not replanned and not self.path and self.goals:
+                if len(self.goals) == self.retried:
+                    print("Fleet: goals given up: %s" % self.goals)
+                    self.abandoned = self.goals
+                else:
+                    self.retried = len(self.goals)
+                    replanned = True
+            if replanned:
+                self.plan()
+            if not self.path:
+                print("Fleet: No moves left!")
+                self.close()
+                return
+            moved = False
+            for index, waiter in enumerate(self.waiters):
+                if waiter.path:
+                    # planned paths never cross, but after manual moves waiter gives way instead of bumping
+                    # and paths of the fleet are planned again in next round
+                    if waiter.path[0] != [0, 0] and isinstance(self.restaurant.get(waiter.x + waiter.path[0][0],
+                                                                                   waiter.y + waiter.path[0][1]), str) \
+                            and not self.restaurant.is_empty(waiter.x + waiter.path[0][0], waiter.y + waiter.path[0][1]):
+                        print("Fleet: waiter %s waits for other waiter" % index)
+                        self.control = False
+                        continue
+                    moved = moved or waiter.path[0] != [0, 0]
+                    waiter.move(waiter.path[0][0], waiter.path[0][1])
+            # nobody can move even with fresh plan - waiters block each other in narrow space
+            if not moved and replanned:
+                print("Fleet: waiters block each other, goals left: %s" % self.goals)
+                for waiter in self.waiters:
+                    waiter.path = []
+            self.steps_count = self.steps_count + 1
+
+    # stop predictors of all waiters
+    def close(self):
+        for waiter in self.waiters:
+            waiter.close()
@@ -1,7 +1,7 @@
 # furnace object class:
 
 import pygame
-from UberKelner import init_graphics
+from scripts.graphics import init_graphics
 
 
 # init of object with sprite - pygames requirement
@@ -0,0 +1,26 @@
+# graphics of sprites:
+# common init of sprites of all objects of simulation - kept apart from simulation controller, so object scripts
+# never import UberKelner.py (which imports them again)
+
+from os import path
+
+import pygame
+
+# size of sprites in px
+blocksize = 60
+
+
+# init sprite sprite_name on coordinate x, y
+def init_graphics(self, a, b, sprite_name):
+    # \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+    # init graphics - do not touch!
+    pygame.sprite.Sprite.__init__(self)
+    # set image
+    self.image = pygame.image.load(path.join('images', sprite_name + '.png'))
+    # resize image to blocksize
+    self.image = pygame.transform.scale(self.image, (blocksize, blocksize))
+    # set coordinates
+    self.rect = self.image.get_rect()
+    self.rect.x = a * blocksize
+    self.rect.y = b * blocksize
+    # //////////////////////////////////////////////////
@@ -0,0 +1,369 @@
+# grid graph object class:
+# compact graph of restaurant - cells are integers x * n + y, passability of cells is kept as byte mask
+# and adjacency as flat array with four slots per cell (constant row stride, -1 marks missing connection)
+
+import heapq
+import math
+from array import array
+from collections import deque
+
+import numpy
+from scipy import ndimage
+
+# passability of cells
+BLOCKED = 0
+# blank tiles (and waiter) - can be walked through
+FLOOR = 1
+# tables and furnaces - can be entered to be served, but never walked through
+SERVICE = 2
+
+
+# order of neighbour slots - the same as order of connections in Matrix.to_graph
+DIRECTIONS = [[-1, 0], [1, 0], [0, -1], [0, 1]]
+
+
+# calculate connections of all cells from 2d array of passability: for every direction
+# boolean array telling if cell is connected with its neighbour in this direction
+def connections(passable):
+    rows, columns = passable.shape
+    links = []
+    for vec in DIRECTIONS:
+        # neighbour of every cell in direction vec, blocked outside of grid
+        neighbour = numpy.zeros_like(passable)
+        neighbour[max(0, -vec[0]):rows - max(0, vec[0]), max(0, -vec[1]):columns - max(0, vec[1])] = \
+            passable[max(0, vec[0]):rows - max(0, -vec[0]), max(0, vec[1]):columns - max(0, -vec[1])]
+        # connections between blanks, blank and table, blank and kitchen
+        links.append((passable != BLOCKED) & (neighbour != BLOCKED)
+                     & ~((passable == SERVICE) & (neighbour == SERVICE)))
+    return links
+
+
+class GridGraph:
+    directions = DIRECTIONS
+
+    # init graph of n x n cells from list of passability of cells
+    def __init__(self, n, passable):
+        self.n = n
+        self.size = n * n
+        self.passable = bytearray(passable)
+        # cache of manhattan distances to goals, one array per goal
+        self.heuristics = dict()
+        # padded grid of floor cells used by jump point search, calculated when needed
+        self.floor = None
+        # fingerprints of layout (see Landmarks.fingerprint), forgotten when layout changes
+        self.fingerprints = dict()
+        # calculate connections of all cells at once
+        links = connections(numpy.frombuffer(bytes(self.passable), dtype=numpy.uint8).reshape(n, n))
+        cells = numpy.arange(self.size, dtype=numpy.intc).reshape(n, n)
+        neighbours = numpy.full((n, n, 4), -1, dtype=numpy.intc)
+        for slot, (vec, link) in enumerate(zip(self.directions, links)):
+            neighbours[:, :, slot] = numpy.where(link, cells + vec[0] * n + vec[1], -1)
+        self.neighbours = array('i')
+        self.neighbours.frombytes(neighbours.tobytes())
+
+    # calculate connections of cell: between blanks, blank and table, blank and kitchen
+    def link(self, cell):
+        x, y = divmod(cell, self.n)
+        for slot, vec in enumerate(self.directions):
+            self.neighbours[4 * cell + slot] = -1
+            new_x, new_y = x + vec[0], y + vec[1]
+            if 0 <= new_x < self.n and 0 <= new_y < self.n:
+                next_ = new_x * self.n + new_y
+                if self.passable[cell] and self.passable[next_] \
+                        and not (self.passable[cell] == SERVICE and self.passable[next_] == SERVICE):
+                    self.neighbours[4 * cell + slot] = next_
+
+    # cell with its neighbours inside of grid (connected or not)
+    def around(self, cell):
+        x, y = divmod(cell, self.n)
+        return [cell] + [(x + vec[0]) * self.n + y + vec[1] for vec in self.directions
+                         if 0 <= x + vec[0] < self.n and 0 <= y + vec[1] < self.n]
+
+    # change passability of cell and recalculate connections of the cell and its neighbours only,
+    # returns True if graph has changed
+    def update(self, cell, passability):
+        if self.passable[cell] == passability:
+            return False
+        self.passable[cell] = passability
+        self.fingerprints.clear()
+        for next_ in self.around(cell):
+            self.link(next_)
+        if self.floor is not None:
+            self.floor[self.spot(cell)] = int(passability == FLOOR)
+        return True
+
+    # cell of coordinates
+    def cell(self, x, y):
+        return x * self.n + y
+
+    # coordinates of cell
+    def coordinates(self, cell):
+        return list(divmod(cell, self.n))
+
+    # list of cells connected with cell
+    def adjacent(self, cell):
+        return [next_ for next_ in self.neighbours[4 * cell:4 * cell + 4] if next_ != -1]
+
+    # check if search may continue through vertex - tables and furnaces are leaves, except of the start
+    def expandable(self, vertex, start):
+        return self.passable[vertex] != SERVICE or vertex == start
+
+    # follow parent pointers from goal back to start and return list of cells from start to goal
+    @staticmethod
+    def walk(parents, start, goal):
+        path = [goal]
+        while goal != start:
+            goal = parents[goal]
+            path.append(goal)
+        path.reverse()
+        return path
+
+    # manhattan distance from every cell to goal - calculated once per goal
+    def manhattan(self, goal):
+        if goal not in self.heuristics:
+            goal_x, goal_y = divmod(goal, self.n)
+            self.heuristics[goal] = array('i', [abs(x - goal_x) + abs(y - goal_y)
+                                                for x in range(self.n) for y in range(self.n)])
+        return self.heuristics[goal]
+
+    # labels of connected components of floor cells (0 for other cells) as flat array - flood fill of whole grid
+    def components(self):
+        floor = numpy.frombuffer(bytes(self.passable), dtype=numpy.uint8).reshape(self.n, self.n) == FLOOR
+        return ndimage.label(floor)[0].ravel()
+
+    # components through which cell can be entered - its own one for floor, of connected neighbours otherwise
+    def entry_components(self, labels, cell):
+        if self.passable[cell] == FLOOR:
+            return {labels[cell]}
+        return {labels[next_] for next_ in self.adjacent(cell) if self.passable[next_] == FLOOR}
+
+    # check which of cells can be reached from start, without searching for any path
+    def reachable(self, start, cells):
+        labels = self.components()
+        starting = self.entry_components(labels, start)
+        # waiter can not serve object he stands on
+        return [cell != start and (cell in self.adjacent(start) or bool(starting & self.entry_components(labels, cell)))
+                for cell in cells]
+
+    # //////////////////////////////////////////////////
+    #           S E A R C H E S
+    # all searches return list of cells from start to goal, or empty list if there is no path
+
+    # Depth-First Search - stack with visited bitmap, the path is not the shortest one
+    def depth_first(self, start, goal):
+        visited = bytearray(self.size)
+        parents = array('i', [-1]) * self.size
+        stack = [start]
+        while stack:
+            vertex = stack.pop()
+            if visited[vertex]:
+                continue
+            visited[vertex] = 1
+            if vertex == goal:
+                return self.walk(parents, start, goal)
+            if not self.expandable(vertex, start):
+                continue
+            for next_ in self.neighbours[4 * vertex:4 * vertex + 4]:
+                if next_ != -1 and not visited[next_]:
+                    parents[next_] = vertex
+                    stack.append(next_)
+        return []
+
+    # Breadth-First Search - fifo queue with visited bitmap and parent pointers, the shortest path
+    def breadth_first(self, start, goal):
+        visited = bytearray(self.size)
+        parents = array('i', [-1]) * self.size
+        visited[start] = 1
+        queue = deque([start])
+        while queue:
+            vertex = queue.popleft()
+            if vertex == goal:
+                return self.walk(parents, start, goal)
+            if not self.expandable(vertex, start):
+                continue
+            for next_ in self.neighbours[4 * vertex:4 * vertex + 4]:
+                if next_ != -1 and not visited[next_]:
+                    visited[next_] = 1
+                    parents[next_] = vertex
+                    queue.append(next_)
+        return []
+
+    # Best-First Search - greedy search ordered by straight-line distance to goal
+    def best_first(self, start, goal):
+        goal_x, goal_y = divmod(goal, self.n)
+        visited = bytearray(self.size)
+        parents = array('i', [-1]) * self.size
+        visited[start] = 1
+        queue = [(0, start)]
+        while queue:
+            (distance, vertex) = heapq.heappop(queue)
+            if vertex == goal:
+                return self.walk(parents, start, goal)
+            if not self.expandable(vertex, start):
+                continue
+            for next_ in self.neighbours[4 * vertex:4 * vertex + 4]:
+                if next_ != -1 and not visited[next_]:
+                    visited[next_] = 1
+                    parents[next_] = vertex
+                    x, y = divmod(next_, self.n)
+                    heapq.heappush(queue, (math.isqrt((x - goal_x) ** 2 + (y - goal_y) ** 2), next_))
+        return []
+
+    # A* Search - binary heap with lazy deletion of outdated entries, g-scores, closed set
+    # and manhattan heuristic (or other lower bounds of distances to goal, one per cell), the shortest path
+    def a_star(self, start, goal, heuristic=None):
+        heuristic = self.manhattan(goal) if heuristic is None else heuristic
+        g_scores = array('i', [-1]) * self.size
+        parents = array('i', [-1]) * self.size
+        closed = bytearray(self.size)
+        g_scores[start] = 0
+        # ties of f-score are broken in favour of deeper nodes
+        queue = [(heuristic[start], 0, start)]
+        while queue:
+            (f_score, negative_g_score, vertex) = heapq.heappop(queue)
+            if closed[vertex]:
+                continue
+            closed[vertex] = 1
+            if vertex == goal:
+                return self.walk(parents, start, goal)
+            if not self.expandable(vertex, start):
+                continue
+            cost = 1 - negative_g_score
+            for next_ in self.neighbours[4 * vertex:4 * vertex + 4]:
+                if next_ != -1 and not closed[next_] and (g_scores[next_] == -1 or cost < g_scores[next_]):
+                    g_scores[next_] = cost
+                    parents[next_] = vertex
+                    heapq.heappush(queue, (cost + heuristic[next_], -cost, next_))
+        return []
+
+    # Jump Point Search - A* over jump points of 4-connected grid, the shortest path. Straight runs of open floor
+    # are skipped without pushing their cells to queue - only cells where the way may turn are expanded.
+    # Jumps work on padded floor grid (see floor_grid), positions in it are called spots
+    def jump_point(self, start, goal):
+        if not self.passable[goal]:
+            return []
+        floor, width = self.floor_grid(), self.n + 2
+        start_spot, goal_spot = self.spot(start), self.spot(goal)
+        goal_x, goal_y = divmod(goal_spot, width)
+        g_scores = {start_spot: 0}
+        parents = {start_spot: start_spot}
+        closed = set()
+        memo = dict()
+        queue = [(0, 0, start_spot)]
+        while queue:
+            (f_score, negative_g_score, vertex) = heapq.heappop(queue)
+            if vertex in closed:
+                continue
+            closed.add(vertex)
+            if vertex == goal_spot:
+                return self.interpolate(parents, start_spot, goal_spot)
+            if vertex == start_spot:
+                # start may be a table or furnace - only its connections can be followed
+                steps = [self.spot(next_) - vertex for next_ in self.adjacent(start)]
+            else:
+                steps = self.pruned_steps(floor, vertex, parents[vertex], goal_spot)
+            x, y = divmod(vertex, width)
+            for step in steps:
+                if step in (width, -width):
+                    jump_point = self.jump_horizontally(floor, vertex + step, step, goal_spot, memo)
+                else:
+                    jump_point = self.jump_vertically(floor, vertex + step, step, goal_spot, memo)
+                if jump_point is None or jump_point in closed:
+                    continue
+                jump_x, jump_y = divmod(jump_point, width)
+                cost = abs(jump_x - x) + abs(jump_y - y) - negative_g_score
+                if jump_point not in g_scores or cost < g_scores[jump_point]:
+                    g_scores[jump_point] = cost
+                    parents[jump_point] = vertex
+                    heapq.heappush(queue, (cost + abs(jump_x - goal_x) + abs(jump_y - goal_y), -cost, jump_point))
+        return []
+
+    # dense grid of floor cells (1 - floor, 0 - anything else) with border of blocked cells around restaurant,
+    # calculated once and kept up to date by update
+    def floor_grid(self):
+        if self.floor is None:
+            passable = numpy.frombuffer(bytes(self.passable), dtype=numpy.uint8).reshape(self.n, self.n)
+            self.floor = bytearray(numpy.pad(passable == FLOOR, 1).astype(numpy.uint8).tobytes())
+        return self.floor
+
+    # spot of cell in padded floor grid
+    def spot(self, cell):
+        x, y = divmod(cell, self.n)
+        return (x + 1) * (self.n + 2) + y + 1
+
+    # steps worth searching from vertex reached from parent - natural neighbours of 4-connected move:
+    # forward and both sides when moving along x, only forward and both sides when moving along y
+    def pruned_steps(self, floor, vertex, parent, goal):
+        width = self.n + 2
+        if abs(vertex - parent) >= width:
+            steps = [-1, 1, width if vertex > parent else -width]
+        else:
+            steps = [-width, width, 1 if vertex > parent else -1]
+        return [step for step in steps if floor[vertex + step] or vertex + step == goal]
+
+    # jump along y from spot until goal, jump point (spot with forced neighbour) or obstacle,
+    # returns spot of jump point or None
+    def jump_vertically(self, floor, spot, step, goal, memo):
+        width = self.n + 2
+        while floor[spot] or spot == goal:
+            if spot == goal:
+                return goal
+            # forced neighbours - side becomes open after obstacle
+            # (goal can not be walked through, so behind the move it is an obstacle too)
+            if ((floor[spot - width] or spot - width == goal) and not floor[spot - width - step]) \
+                    or ((floor[spot + width] or spot + width == goal) and not floor[spot + width - step]):
+                return spot
+            # move along y stops where jump along x finds something
+            if self.jump_horizontally(floor, spot + width, width, goal, memo) is not None \
+                    or self.jump_horizontally(floor, spot - width, -width, goal, memo) is not None:
+                return spot
+            spot += step
+        return None
+
+    # jump along x from spot - every spot of the run leads to the same jump point, so the result is remembered
+    # for all of them and jumps along y scanning the same run again read it from memo
+    @staticmethod
+    def jump_horizontally(floor, spot, step, goal, memo):
+        run = []
+        jump_point = None
+        while floor[spot] or spot == goal:
+            key = 2 * spot + (step > 0)
+            if key in memo:
+                jump_point = memo[key]
+                break
+            run.append(key)
+            # forced neighbours
+            if spot == goal or ((floor[spot - 1] or spot - 1 == goal) and not floor[spot - step - 1]) \
+                    or ((floor[spot + 1] or spot + 1 == goal) and not floor[spot - step + 1]):
+                jump_point = spot
+                break
+            spot += step
+        for key in run:
+            memo[key] = jump_point
+        return jump_point
+
+    # join jump points (spots) from start to goal into list of all cells between them
+    def interpolate(self, parents, start, goal):
+        width = self.n + 2
+        jump_points = GridGraph.walk(parents, start, goal)
+        spots = [start]
+        for jump_point in jump_points[1:]:
+            difference = jump_point - spots[-1]
+            step = (width if abs(difference) >= width else 1) * (1 if difference > 0 else -1)
+            spots += range(spots[-1] + step, jump_point + step, step)
+        return [(spot // width - 1) * self.n + spot % width - 1 for spot in spots]
+
+    # breadth-first flood from source - fills distances and parents of all cells, starting at offset
+    def flood(self, source, distances, parents, offset=0):
+        distances[offset + source] = 0
+        queue = deque([source])
+        while queue:
+            vertex = queue.popleft()
+            if not self.expandable(vertex, source):
+                continue
+            distance = distances[offset + vertex] + 1
+            for next_ in self.neighbours[4 * vertex:4 * vertex + 4]:
+                if next_ != -1 and distances[offset + next_] == -1:
+                    distances[offset + next_] = distance
+                    parents[offset + next_] = vertex
+                    queue.append(next_)
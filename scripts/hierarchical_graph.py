@@ -0,0 +1,208 @@
+# hierarchical graph object class:
+# abstraction of grid graph for hierarchical path-finding (HPA*) - grid is divided into square clusters,
+# entrances between neighbouring clusters and distances between entrances of every cluster are calculated
+# once per layout. Search runs over graph of entrances and only clusters on the chosen way are searched cell by cell.
+
+import heapq
+from collections import deque
+
+from scripts.grid_graph import *
+
+
+class HierarchicalGraph:
+    # runs of passable border cells not shorter than this get two entrances (at both ends) instead of one
+    wide_entrance = 6
+
+    # init hierarchy over grid graph (as returned by Matrix.to_compact_graph) with clusters of given size
+    def __init__(self, graph, cluster_size=10):
+        self.graph = graph
+        self.n = graph.n
+        self.cluster_size = cluster_size
+        self.clusters_in_row = -(-self.n // cluster_size)
+        # pairs of neighbouring cells (one on every side of border) by border - key is pair of clusters
+        self.transitions = dict()
+        # connections between entrances of neighbouring clusters
+        self.inter = dict()
+        # entrances of every cluster and distances between entrances inside of cluster
+        self.entrances = dict()
+        self.intra = dict()
+        for cluster in range(self.clusters_in_row ** 2):
+            for other in self.following_clusters(cluster):
+                self.calculate_border(cluster, other)
+        for cluster in range(self.clusters_in_row ** 2):
+            self.calculate_cluster(cluster)
+
+    # cluster containing cell
+    def cluster(self, cell):
+        x, y = divmod(cell, self.n)
+        return (x // self.cluster_size) * self.clusters_in_row + y // self.cluster_size
+
+    # neighbouring clusters below and on the right of cluster
+    def following_clusters(self, cluster):
+        cluster_x, cluster_y = divmod(cluster, self.clusters_in_row)
+        return ([cluster + self.clusters_in_row] if cluster_x + 1 < self.clusters_in_row else []) \
+            + ([cluster + 1] if cluster_y + 1 < self.clusters_in_row else [])
+
+    # pairs of cells along border between cluster and following cluster other
+    def border(self, cluster, other):
+        cluster_x, cluster_y = divmod(cluster, self.clusters_in_row)
+        if other == cluster + self.clusters_in_row:
+            x = (cluster_x + 1) * self.cluster_size - 1
+            return [(self.graph.cell(x, y), self.graph.cell(x + 1, y))
+                    for y in range(cluster_y * self.cluster_size, min((cluster_y + 1) * self.cluster_size, self.n))]
+        y = (cluster_y + 1) * self.cluster_size - 1
+        return [(self.graph.cell(x, y), self.graph.cell(x, y + 1))
+                for x in range(cluster_x * self.cluster_size, min((cluster_x + 1) * self.cluster_size, self.n))]
+
+    # find entrances on border between cluster and following cluster other - one in the middle of every run
+    # of pairs of floor cells, or two at the ends of wide runs. Only floor cells can be walked through,
+    # so tables and furnaces are never entrances
+    def calculate_border(self, cluster, other):
+        for a, b in self.transitions.pop((cluster, other), []):
+            self.inter[a].discard(b)
+            self.inter[b].discard(a)
+        transitions = []
+        run = []
+        for a, b in self.border(cluster, other) + [(None, None)]:
+            if a is not None and self.graph.passable[a] == FLOOR and self.graph.passable[b] == FLOOR:
+                run.append((a, b))
+                continue
+            if len(run) >= self.wide_entrance:
+                transitions += [run[0], run[-1]]
+            elif run:
+                transitions.append(run[len(run) // 2])
+            run = []
+        for a, b in transitions:
+            self.inter.setdefault(a, set()).add(b)
+            self.inter.setdefault(b, set()).add(a)
+        self.transitions[(cluster, other)] = transitions
+
+    # calculate entrances of cluster and distances between them inside of cluster
+    def calculate_cluster(self, cluster):
+        cluster_x, cluster_y = divmod(cluster, self.clusters_in_row)
+        neighbours = [(cluster - self.clusters_in_row, cluster)] if cluster_x > 0 else []
+        neighbours += [(cluster - 1, cluster)] if cluster_y > 0 else []
+        neighbours += [(cluster, other) for other in self.following_clusters(cluster)]
+        self.entrances[cluster] = set(a if self.cluster(a) == cluster else b
+                                      for key in neighbours for a, b in self.transitions.get(key, []))
+        self.intra[cluster] = {entrance: self.distances_in_cluster(entrance, self.entrances[cluster])
+                               for entrance in self.entrances[cluster]}
+
+    # breadth-first flood from source limited to its cluster, until target is reached (if given)
+    # returns dictionaries of distances and parents of reached cells
+    def flood(self, source, target=None):
+        cluster = self.cluster(source)
+        distances = {source: 0}
+        parents = dict()
+        queue = deque([source])
+        while queue:
+            vertex = queue.popleft()
+            if vertex == target:
+                break
+            if not self.graph.expandable(vertex, source):
+                continue
+            for next_ in self.graph.neighbours[4 * vertex:4 * vertex + 4]:
+                if next_ != -1 and next_ not in distances and self.cluster(next_) == cluster:
+                    distances[next_] = distances[vertex] + 1
+                    parents[next_] = vertex
+                    queue.append(next_)
+        return distances, parents
+
+    # distances from source to targets reachable inside of its cluster
+    def distances_in_cluster(self, source, targets):
+        distances = self.flood(source)[0]
+        return {target: distances[target] for target in targets if target in distances and target != source}
+
+    # update hierarchy after change of passability of cell - only border of cluster containing the cell
+    # (if the cell lies on it) and clusters around this border are calculated again
+    def update(self, cell):
+        cluster = self.cluster(cell)
+        x, y = divmod(cell, self.n)
+        changed = {cluster}
+        for vec in self.graph.directions:
+            next_x, next_y = x + vec[0], y + vec[1]
+            if 0 <= next_x < self.n and 0 <= next_y < self.n:
+                other = self.cluster(self.graph.cell(next_x, next_y))
+                if other != cluster:
+                    self.calculate_border(min(cluster, other), max(cluster, other))
+                    changed.add(other)
+        for changed_cluster in changed:
+            self.calculate_cluster(changed_cluster)
+
+    # //////////////////////////////////////////////////
+    #           S E A R C H
+
+    # floor cells representing cell in graph of entrances - the cell itself, or its neighbours for tables
+    # and furnaces, which can not be walked through
+    def representatives(self, cell):
+        if self.graph.passable[cell] == FLOOR:
+            return [cell]
+        return [next_ for next_ in self.graph.adjacent(cell) if self.graph.passable[next_] == FLOOR]
+
+    # hierarchical A* search - start and goal are connected to entrances of their clusters, the way is found
+    # in graph of entrances and refined cluster by cluster; returns list of cells from start to goal
+    # or empty list if there is no path. Paths are near-optimal, not always the shortest ones
+    def search(self, start, goal):
+        if start == goal:
+            return [start]
+        # temporary connections of start and goal with graph of entrances
+        temporary = dict()
+        starts, goals = self.representatives(start), self.representatives(goal)
+        for representative in starts:
+            if representative != start:
+                temporary.setdefault(start, dict())[representative] = 1
+        for representative in goals:
+            if representative != goal:
+                temporary.setdefault(representative, dict())[goal] = 1
+        if goal in self.graph.adjacent(start):
+            temporary.setdefault(start, dict())[goal] = 1
+        inserted = set(starts + goals)
+        for representative in inserted:
+            cluster = self.cluster(representative)
+            targets = self.entrances[cluster] | set(cell for cell in inserted if self.cluster(cell) == cluster)
+            for target, distance in self.distances_in_cluster(representative, targets).items():
+                temporary.setdefault(representative, dict())[target] = distance
+                temporary.setdefault(target, dict())[representative] = distance
+        way = self.abstract_search(start, goal, temporary)
+        return self.refine(way) if way else []
+
+    # A* search in graph of entrances with manhattan heuristic
+    def abstract_search(self, start, goal, temporary):
+        goal_x, goal_y = divmod(goal, self.n)
+        g_scores = {start: 0}
+        parents = dict()
+        closed = set()
+        queue = [(0, 0, start)]
+        while queue:
+            (f_score, negative_g_score, vertex) = heapq.heappop(queue)
+            if vertex in closed:
+                continue
+            closed.add(vertex)
+            if vertex == goal:
+                return GridGraph.walk(parents, start, goal)
+            # tables and furnaces are never walked through
+            if vertex != start and self.graph.passable[vertex] != FLOOR:
+                continue
+            connections = list(self.intra[self.cluster(vertex)].get(vertex, dict()).items())
+            connections += [(next_, 1) for next_ in self.inter.get(vertex, ())]
+            connections += list(temporary.get(vertex, dict()).items())
+            for next_, distance in connections:
+                cost = distance - negative_g_score
+                if next_ not in closed and (next_ not in g_scores or cost < g_scores[next_]):
+                    g_scores[next_] = cost
+                    parents[next_] = vertex
+                    x, y = divmod(next_, self.n)
+                    heapq.heappush(queue, (cost + abs(x - goal_x) + abs(y - goal_y), -cost, next_))
+        return []
+
+    # replace way through entrances with cells - neighbouring vertices of different clusters are adjacent,
+    # vertices of the same cluster are connected with search limited to this cluster
+    def refine(self, way):
+        path = [way[0]]
+        for vertex, next_ in zip(way, way[1:]):
+            if self.cluster(vertex) != self.cluster(next_):
+                path.append(next_)
+                continue
+            parents = self.flood(vertex, next_)[1]
+            path += GridGraph.walk(parents, vertex, next_)[1:]
+        return path
@@ -0,0 +1,106 @@
+# landmarks object class:
+# ALT heuristic (A*, landmarks, triangle inequality) - exact distances from a handful of landmark cells
+# are calculated once per layout and kept in compact arrays; for any cell and goal the difference
+# of their distances to a landmark is a lower bound of distance between them.
+# Distances are calculated in relaxed graph, where tables and furnaces can be walked through - distances
+# in it are never longer than in restaurant, so the bound holds also for paths which must not pass tables.
+
+import hashlib
+from array import array
+from collections import OrderedDict
+
+import numpy
+
+from scripts.grid_graph import *
+
+
+class Landmarks:
+    # landmarks of recently used layouts, by fingerprint of layout
+    cache = OrderedDict()
+    cache_capacity = 16
+    # number of lower bound arrays of goals kept by every layout
+    heuristics_capacity = 64
+
+    # init landmarks of grid graph - count landmarks chosen by farthest point rule, starting from seed cell
+    def __init__(self, graph, count=8, seed=None):
+        self.n = graph.n
+        self.size = graph.size
+        # relaxed graph - every cell which is not blocked can be walked through
+        relaxed = GridGraph(self.n, self.relax(graph.passable))
+        open_cells = numpy.flatnonzero(numpy.frombuffer(bytes(relaxed.passable), dtype=numpy.uint8))
+        self.cells = []
+        # distances from landmarks to all cells, one row per landmark, -1 marks cells which can not be reached
+        self.distances = numpy.full((count, self.size), -1, dtype=numpy.int32)
+        if len(open_cells) == 0:
+            self.distances = self.distances[:0]
+            self.heuristics = OrderedDict()
+            return
+        if seed is None or not relaxed.passable[seed]:
+            seed = int(open_cells[0])
+        # the first landmark is the cell farthest from seed, every next one is the farthest from all previous ones
+        nearest = self.flood(relaxed, seed)
+        for row in range(count):
+            reached = numpy.flatnonzero(nearest >= 0)
+            landmark = int(reached[nearest[reached].argmax()])
+            if row > 0 and nearest[landmark] == 0:
+                break
+            self.cells.append(landmark)
+            self.distances[row] = self.flood(relaxed, landmark)
+            nearest = self.distances[row] if row == 0 else numpy.minimum(nearest, self.distances[row])
+        self.distances = self.distances[:len(self.cells)]
+        # lower bounds of distances to goals, by goal
+        self.heuristics = OrderedDict()
+
+    # passability of relaxed graph - tables and furnaces become floor
+    @staticmethod
+    def relax(passable):
+        return bytes(passable).replace(bytes([SERVICE]), bytes([FLOOR]))
+
+    # fingerprint of layout - only blocked cells matter for relaxed graph. It is kept by graph until its layout
+    # changes, so legs of the same route do not hash the whole layout again
+    @staticmethod
+    def fingerprint(graph, count):
+        key = ('landmarks', count)
+        if key not in graph.fingerprints:
+            graph.fingerprints[key] = hashlib.sha1(Landmarks.relax(graph.passable)
+                                                   + bytes([graph.n % 256, count])).hexdigest()
+        return graph.fingerprints[key]
+
+    # landmarks of layout of graph, calculated only if the layout was not seen recently
+    @classmethod
+    def of(cls, graph, count=8, seed=None):
+        key = cls.fingerprint(graph, count)
+        if key not in cls.cache:
+            print("Landmarks: calculating %s landmarks of layout..." % count)
+            cls.cache[key] = cls(graph, count, seed)
+            while len(cls.cache) > cls.cache_capacity:
+                cls.cache.popitem(last=False)
+        cls.cache.move_to_end(key)
+        return cls.cache[key]
+
+    # breadth-first flood in relaxed graph, returns distances from source to all cells as numpy array
+    @staticmethod
+    def flood(relaxed, source):
+        distances = array('i', [-1]) * relaxed.size
+        parents = array('i', [-1]) * relaxed.size
+        relaxed.flood(source, distances, parents)
+        return numpy.frombuffer(distances, dtype=numpy.int32).copy()
+
+    # lower bound of distance from every cell to goal - the best of manhattan distance and landmark bounds
+    # |d(landmark, goal) - d(landmark, cell)|, calculated once per goal
+    def heuristic(self, goal):
+        if goal not in self.heuristics:
+            cells = numpy.arange(self.size, dtype=numpy.int32)
+            goal_x, goal_y = divmod(goal, self.n)
+            bound = numpy.abs(cells // self.n - goal_x) + numpy.abs(cells % self.n - goal_y)
+            for distances in self.distances:
+                if distances[goal] >= 0:
+                    # landmarks which reach neither the goal nor the cell tell nothing about them
+                    bound = numpy.maximum(bound, numpy.where(distances >= 0,
+                                                             numpy.abs(distances - distances[goal]), 0))
+            self.heuristics[goal] = array('i')
+            self.heuristics[goal].frombytes(bound.astype(numpy.int32).tobytes())
+            while len(self.heuristics) > self.heuristics_capacity:
+                self.heuristics.popitem(last=False)
+        self.heuristics.move_to_end(goal)
+        return self.heuristics[goal]
@@ -1,16 +1,46 @@
 # matrix object class:
 
-import copy
+import numpy
 
 from scripts.dinning_table import *
 from scripts.furnace import *
+from scripts.wall import *
+from scripts.grid_graph import *
+from scripts.hierarchical_graph import *
+from scripts.snapshot import *
+
+# types of cells kept in occupancy grid
+CELL_EMPTY = 0
+CELL_WAITER = 1
+CELL_TABLE = 2
+CELL_FURNACE = 3
+CELL_WALL = 4
+CELL_OTHER = 5
+
+# passability of every type of cell: blanks and waiter can be walked through, tables and kitchens can be only served
+CELL_PASSABILITY = numpy.array([FLOOR, FLOOR, SERVICE, SERVICE, BLOCKED, BLOCKED], dtype=numpy.uint8)
 
 
 class Matrix:
     # matrix init, set rows and columns, fill is optional - 0 by default
     def __init__(self, rows, columns, fill="_"):
         self.fill = fill
-        self.matrix = [[self.fill for _ in range(columns)] for _ in range(rows)]
+        # occupancy grid - type of every cell
+        self.cells = numpy.zeros((rows, columns), dtype=numpy.uint8)
+        # registry of objects placed in matrix, by coordinates
+        self.objects = dict()
+        # spatial index - coordinates occupied by objects of every class
+        self.index = dict()
+        # version of matrix - increased by every change, rows changed since last snapshot and the last snapshot
+        self.version = 0
+        self.dirty_rows = set(range(rows))
+        self.last_snapshot = None
+        # compact graph kept up to date with changes of matrix and procedures called with cell of graph
+        # after every change of it
+        self.compact_graph = None
+        self.graph_listeners = []
+        # hierarchy of clusters over compact graph, kept up to date with it
+        self.hierarchical_graph = None
 
     # print matrix content beautified when calling print(matrix)
     def __repr__(self):
@@ -23,12 +53,65 @@ class Matrix:
         # return content
         return '\n'.join(table) + '\n' + "------------------------------------"
 
+    # list of lists with content of all coordinates - legacy view of matrix, built on demand
+    @property
+    def matrix(self):
+        return [[self.get(x, y) for y in range(self.cells.shape[1])] for x in range(self.cells.shape[0])]
+
+    # type of cell occupied by object
+    def cell_type(self, object_):
+        if isinstance(object_, str):
+            return CELL_EMPTY if object_ == self.fill else CELL_WAITER
+        if isinstance(object_, DinningTable):
+            return CELL_TABLE
+        if isinstance(object_, Furnace):
+            return CELL_FURNACE
+        if isinstance(object_, Wall):
+            return CELL_WALL
+        return CELL_OTHER
+
+    # content of coordinates - object or fill
+    def get(self, x, y):
+        return self.objects.get((x, y), self.fill)
+
+    # register change of coordinates
+    def touch(self, x, y):
+        self.version += 1
+        self.dirty_rows.add(x)
+
+    # update connections of compact graph around changed coordinates and notify listeners
+    def update_graph(self, x, y):
+        if self.compact_graph is not None:
+            cell = self.compact_graph.cell(x, y)
+            if self.compact_graph.update(cell, CELL_PASSABILITY[self.cells[x, y]]):
+                if self.hierarchical_graph is not None:
+                    self.hierarchical_graph.update(cell)
+                for listener in self.graph_listeners:
+                    listener(cell)
+
+    # place object on coordinates
+    def place(self, object_to_insert, x, y):
+        self.touch(x, y)
+        self.cells[x, y] = self.cell_type(object_to_insert)
+        self.objects[(x, y)] = object_to_insert
+        self.index.setdefault(type(object_to_insert), set()).add((x, y))
+        self.update_graph(x, y)
+
+    # remove object from coordinates and return it
+    def take(self, x, y):
+        self.touch(x, y)
+        self.cells[x, y] = CELL_EMPTY
+        object_to_remove = self.objects.pop((x, y))
+        self.index[type(object_to_remove)].discard((x, y))
+        self.update_graph(x, y)
+        return object_to_remove
+
     # insert object on its own coordinates
     def simple_insert(self, object_to_insert):
         # if space in matrix is empty and new coordinates are empty
         if self.is_empty(object_to_insert.x, object_to_insert.y):
             # insert object to matrix
-            self.matrix[object_to_insert.x][object_to_insert.y] = object_to_insert
+            self.place(object_to_insert, object_to_insert.x, object_to_insert.y)
             return True
         else:
             return False
@@ -36,7 +119,7 @@ class Matrix:
     # insert object on other coordinates than its own
     def insert(self, object_to_insert, x, y):
         if self.is_empty(x, y):
-            self.matrix[x][y] = object_to_insert
+            self.place(object_to_insert, x, y)
             return True
         else:
             return False
@@ -44,7 +127,7 @@ class Matrix:
     # remove object and set fill instead
     def delete_object(self, x, y):
         if not self.is_empty(x, y):
-            self.matrix[x][y] = self.fill
+            self.take(x, y)
             return True
         else:
             return False
@@ -54,8 +137,7 @@ class Matrix:
         # if there is object to move and new space is not occupied
         if not self.is_empty(x, y) and self.is_empty(new_x, new_y):
             # move object and fill its previous place
-            self.matrix[new_x][new_y] = self.matrix[x][y]
-            self.matrix[x][y] = self.fill
+            self.place(self.take(x, y), new_x, new_y)
             return True
         else:
             return False
@@ -64,89 +146,100 @@ class Matrix:
     # noinspection PyUnresolvedReferences
     def activate(self, x, y):
         try:
-            self.matrix[x][y].activated()
+            self.get(x, y).activated()
+            self.touch(x, y)
         except AttributeError:
             print("Matrix: Trying to activate non-operateable object at: " + str(x) + ", " + str(y))
 
-    # returns list of objects by checking object class type, not content
+    # coordinates of all objects of class or tuple of classes (and their subclasses), read from spatial index
+    def coordinates_of(self, wanted_class):
+        return sorted(coordinates for indexed_class, indexed_coordinates in self.index.items()
+                      if issubclass(indexed_class, wanted_class) and not issubclass(indexed_class, str)
+                      for coordinates in indexed_coordinates)
+
+    # returns list of objects by checking object class type, not content - wanted object may be instance or class
     def objects_to_list(self, wanted_object):
-        list_of_wanted_objects = list()
-        for i in range(len(self.matrix)):
-            for j in range(len(self.matrix)):
-                if isinstance(self.matrix[i][j], type(wanted_object)):
-                    list_of_wanted_objects.append((self.matrix[i][j]))
-        return list_of_wanted_objects
+        wanted_class = wanted_object if isinstance(wanted_object, type) else type(wanted_object)
+        if issubclass(wanted_class, str):
+            # all strings - blanks and waiter
+            return [self.get(x, y) for x, y in numpy.argwhere(self.cells <= CELL_WAITER).tolist()]
+        return [self.objects[coordinates] for coordinates in self.coordinates_of(wanted_class)]
 
     # returns list of all objects - better performance of matrix, no double-checking
     def all_objects_to_list(self):
-        list_of_wanted_objects = list()
-        for i in range(len(self.matrix)):
-            for j in range(len(self.matrix)):
-                if not isinstance(self.matrix[i][j], type(self.fill)) \
-                        and not isinstance(self.matrix[i][j], str):
-                    list_of_wanted_objects.append((self.matrix[i][j]))
-        return list_of_wanted_objects
+        return [self.objects[coordinates] for coordinates in self.coordinates_of(object)]
+
+    # returns list of objects still waiting for service - active tables and furnaces, or active objects of class
+    def active_objects_to_list(self, wanted_class=(DinningTable, Furnace)):
+        return [self.objects[coordinates] for coordinates in self.coordinates_of(wanted_class)
+                if self.objects[coordinates].state != 0]
 
     # check if coordinates are empty
     def is_empty(self, x, y):
-        try:
-            return self.matrix[x][y] == self.fill \
-                   and x >= 0 and y >= 0
-        except IndexError:
-            return False
+        return 0 <= x < self.cells.shape[0] and 0 <= y < self.cells.shape[1] and self.cells[x, y] == CELL_EMPTY
 
-    # return copy of matrix - regular '=' would just set reference to source, not copy the content
+    # return copy of matrix - immutable snapshot instead of deep copy of all sprites
     def get_matrix(self):
-        return copy.deepcopy(self.matrix)
+        return self.snapshot()
+
+    # take snapshot of types of cells and states of objects, rows not changed since last snapshot are shared
+    def snapshot(self):
+        if self.last_snapshot is not None and not self.dirty_rows:
+            return self.last_snapshot
+        if self.last_snapshot is None:
+            cells, states = [None] * self.cells.shape[0], [None] * self.cells.shape[0]
+        else:
+            cells, states = list(self.last_snapshot.cells), list(self.last_snapshot.states)
+        for x in self.dirty_rows:
+            cells[x] = self.cells[x].tobytes()
+            states[x] = bytes(getattr(self.get(x, y), 'state', 0) for y in range(self.cells.shape[1]))
+        self.dirty_rows = set()
+        self.last_snapshot = Snapshot(self.version, cells, states)
+        return self.last_snapshot
 
     # parse matrix to graph understandable for DFS algorithm
     def to_graph(self):
         print("Matrix: converting matrix to graph...")
+        links = connections(CELL_PASSABILITY[self.cells])
         graph = dict()
-        # list of available connections
-        connections = [[type(self.fill), type(self.fill)],
-                       [type(self.fill), type(Furnace(0, 0))], [type(self.fill), type(DinningTable(0, 0))]]
         # parse matrix:
-        for i in range(len(self.matrix)):
-            for j in range(len(self.matrix)):
-                key = "{0},{1}".format(i, j)
-                value_list = list()
-                for vec in [[-1, 0], [1, 0], [0, -1], [0, 1]]:
-                    try:
-                        # add connection between blanks, blank and table, blank and kitchen
-                        if (([type(self.matrix[i][j]), type(self.matrix[i + vec[0]][j + vec[1]])] in connections
-                                or [type(self.matrix[i + vec[0]][j + vec[1]]), type(self.matrix[i][j])] in connections)
-                                and i + vec[0] >= 0 and j + vec[1] >= 0):
-                            value_list.append("{0},{1}".format(i + vec[0], j + vec[1]))
-                    except IndexError:
-                        pass
-                graph[key] = set(value_list)
+        for i in range(self.cells.shape[0]):
+            for j in range(self.cells.shape[1]):
+                graph["{0},{1}".format(i, j)] = set("{0},{1}".format(i + vec[0], j + vec[1])
+                                                    for vec, link in zip(GridGraph.directions, links) if link[i, j])
         print("Matrix: converted matrix to graph.")
         return graph
 
+    # parse matrix to compact graph with integer cells, used by all searches of waiter
+    # the graph is kept up to date by insert, move and delete_object from now on
+    def to_compact_graph(self):
+        print("Matrix: converting matrix to compact graph...")
+        self.compact_graph = GridGraph(self.cells.shape[0], CELL_PASSABILITY[self.cells].tobytes())
+        self.hierarchical_graph = None
+        print("Matrix: converted matrix to compact graph.")
+        return self.compact_graph
+
+    # build hierarchy of clusters over compact graph for hierarchical searches, once per layout
+    # the hierarchy is kept up to date together with compact graph - only clusters around changed cell are updated
+    def to_hierarchical_graph(self, cluster_size=10):
+        if self.compact_graph is None:
+            self.to_compact_graph()
+        if self.hierarchical_graph is None or self.hierarchical_graph.cluster_size != cluster_size:
+            print("Matrix: converting compact graph to hierarchical graph...")
+            self.hierarchical_graph = HierarchicalGraph(self.compact_graph, cluster_size)
+            print("Matrix: converted compact graph to hierarchical graph.")
+        return self.hierarchical_graph
+
     def to_graph_visited_or_not(self):
         print("Matrix: converting matrix to graph...")
+        connected = numpy.logical_or.reduce(connections(CELL_PASSABILITY[self.cells]))
         graph = dict()
-        # list of available connections
-        connections = [[type(self.fill), type(self.fill)],
-                       [type(self.fill), type(Furnace(0, 0))], [type(self.fill), type(DinningTable(0, 0))]]
         # parse matrix:
-        for i in range(len(self.matrix)):
-            for j in range(len(self.matrix)):
-                key = "{0},{1}".format(i, j)
-                value_list = list()
-                for vec in [[-1, 0], [1, 0], [0, -1], [0, 1]]:
-                    try:
-                        # add connection between blanks, blank and table, blank and kitchen
-                        if (([type(self.matrix[i][j]), type(self.matrix[i + vec[0]][j + vec[1]])] in connections
-                             or [type(self.matrix[i + vec[0]][j + vec[1]]), type(self.matrix[i][j])] in connections)
-                                and i + vec[0] >= 0 and j + vec[1] >= 0):
-                            value_list.append("unvisited")
-                    except IndexError:
-                        pass
-                graph[key] = set(value_list)
+        for i in range(self.cells.shape[0]):
+            for j in range(self.cells.shape[1]):
+                graph["{0},{1}".format(i, j)] = {"unvisited"} if connected[i, j] else set()
         print("Matrix: converted matrix to graph.")
         return graph
 
     def size(self):
-        return len(self.matrix)
+        return self.cells.shape[0]
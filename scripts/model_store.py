@@ -0,0 +1,73 @@
+# model store object class:
+# fitted estimators of scikit-learn kept on disk with joblib, under hash of training data, type of estimator
+# and its parameters. Estimator is fitted only once per training data - next waiters and next runs load it,
+# and all waiters of the same process share one instance.
+
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+import joblib
+import numpy
+
+
+class ModelStore:
+    # fitted estimators shared by all stores of process, by key
+    memo = OrderedDict()
+    memo_capacity = 8
+
+    # init store in directory
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    # key of fitted estimator - type and parameters of estimator, shape, type and content of training data
+    @staticmethod
+    def key(estimator, data, target):
+        digest = hashlib.sha1()
+        digest.update((type(estimator).__module__ + '.' + type(estimator).__name__).encode())
+        digest.update(repr(sorted(estimator.get_params().items())).encode())
+        for array in (data, target):
+            array = numpy.ascontiguousarray(array)
+            digest.update(repr((array.dtype.str, array.shape)).encode())
+            digest.update(array.tobytes())
+        return digest.hexdigest()
+
+    # file of estimator on disk
+    def filename(self, key):
+        return os.path.join(self.directory, key + '.joblib')
+
+    # estimator fitted on training data - from memo of process, from disk or fitted now (and saved)
+    def fit(self, estimator, data, target):
+        key = self.key(estimator, data, target)
+        if key not in self.memo:
+            self.memo[key] = self.load(key)
+            if self.memo[key] is None:
+                print("ModelStore: fitting %s on %s samples..." % (type(estimator).__name__, len(target)))
+                self.memo[key] = estimator.fit(data, target)
+                self.save(key, self.memo[key])
+            while len(self.memo) > self.memo_capacity:
+                self.memo.popitem(last=False)
+        self.memo.move_to_end(key)
+        return self.memo[key]
+
+    # estimator stored under key or None
+    def load(self, key):
+        try:
+            estimator = joblib.load(self.filename(key))
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError, ImportError, AttributeError) as e:
+            if os.path.exists(self.filename(key)):
+                print("ModelStore: could not load %s (%s), fitting again" % (key, e))
+            return None
+        print("ModelStore: %s loaded from store." % type(estimator).__name__)
+        return estimator
+
+    # save estimator under key - written to temporary file first, so other processes never read half-written one
+    def save(self, key, estimator):
+        temporary = self.filename(key) + '.%s.tmp' % os.getpid()
+        try:
+            joblib.dump(estimator, temporary)
+            os.replace(temporary, self.filename(key))
+        except OSError as e:
+            print("ModelStore: could not save %s (%s)" % (key, e))
@@ -0,0 +1,396 @@
+# goal ordering engine:
+# chooses order of visiting goals as travelling salesman problem (open path, no return to start)
+# over matrix of distances between start (index 0) and goals (indexes 1..k)
+
+import itertools
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+# cost of leg which could not be found - big enough to be avoided, small enough to be summed safely
+UNREACHABLE = 10 ** 6
+
+# highest number of goals solved with exact Held-Karp dynamic programming, branch and bound is used beyond
+# (tables grow with 2 ** goals - at 16 goals they take tens of megabytes and well under a second)
+HELD_KARP_LIMIT = 16
+
+# lowest number of goals for which exhaustive ordering is worth sending to worker processes
+EXHAUSTIVE_PARALLEL_LIMIT = 8
+
+
+# calculate cost of visiting goals in given order, starting at index 0
+def order_cost(distances, order):
+    cost = 0
+    previous = 0
+    for goal in order:
+        cost += distances[previous][goal]
+        previous = goal
+    return cost
+
+
+# exact Held-Karp dynamic programming with bitmasks, vectorized over all subsets of the same size
+def held_karp(distances):
+    k = len(distances) - 1
+    if k == 0:
+        return []
+    # costs are kept in int32 - tables take half of memory of int64 ones
+    d = numpy.array(distances, dtype=numpy.int32)[1:, 1:]
+    full = 1 << k
+    infinity = numpy.iinfo(numpy.int32).max // 4
+    # dp[mask][j] - cost of the cheapest path from start visiting goals of mask and ending in goal j
+    dp = numpy.full((full, k), infinity, dtype=numpy.int32)
+    parent = numpy.full((full, k), -1, dtype=numpy.int8 if k < 127 else numpy.int16)
+    for j in range(k):
+        dp[1 << j][j] = distances[0][j + 1]
+    # popcount of every mask - subsets are processed layer by layer
+    masks = numpy.arange(full)
+    popcount = numpy.zeros(full, dtype=numpy.int8)
+    for j in range(k):
+        popcount += (masks >> j) & 1
+    for size in range(2, k + 1):
+        layer = masks[popcount == size]
+        for j in range(k):
+            bit = 1 << j
+            current = layer[(layer & bit) != 0]
+            previous = current ^ bit
+            # cost of reaching j from every possible last goal i of previous subset
+            candidates = dp[previous] + d[:, j]
+            # goals outside previous subset can not be the last one
+            candidates[((previous[:, None] >> numpy.arange(k)) & 1) == 0] = infinity
+            best = candidates.argmin(axis=1)
+            dp[current, j] = candidates[numpy.arange(len(current)), best]
+            parent[current, j] = best
+    # reconstruct order from the last goal back to the first one
+    mask = full - 1
+    last = int(dp[mask].argmin())
+    order = []
+    while last != -1:
+        order.append(last + 1)
+        previous = int(parent[mask][last])
+        mask ^= 1 << last
+        last = previous
+    order.reverse()
+    return order
+
+
+# exact Held-Karp over fields goals are served from (as returned by DistanceTable.serving) - leg to the next goal
+# starts on the field waiter reached the previous goal from, so state is set of goals and field waiter stands on.
+# goals[p] is goal of field p (field 0 is start), costs[p][j] cost of leg from field p to goal j and arrivals[p][j]
+# field where it ends (-1 if there is no leg). Returns empty list if some goal can not be reached
+def held_karp_fields(goals, costs, arrivals):
+    k = len(costs[0]) - 1
+    m = len(goals) - 1
+    if k == 0:
+        return []
+    full = 1 << k
+    infinity = numpy.iinfo(numpy.int32).max // 4
+    c = numpy.array(costs, dtype=numpy.int32)
+    a = numpy.array(arrivals)
+    # dp[mask][q - 1] - cost of the cheapest path from start visiting goals of mask and ending on field q
+    dp = numpy.full((full, m), infinity, dtype=numpy.int32)
+    parent = numpy.full((full, m), -1, dtype=numpy.int16)
+    for j in range(1, k + 1):
+        if a[0][j] != -1:
+            dp[1 << (j - 1)][a[0][j] - 1] = c[0][j]
+            parent[1 << (j - 1)][a[0][j] - 1] = 0
+    # fields leading to every field of goal j - cheapest of them is kept for every field waiter arrives on
+    groups = [[] for _ in range(k + 1)]
+    for j in range(1, k + 1):
+        for q in range(1, m + 1):
+            if goals[q] == j:
+                sources = numpy.nonzero(a[1:, j] == q)[0] + 1
+                if len(sources):
+                    groups[j].append((q, sources, c[sources, j]))
+    masks = numpy.arange(full)
+    popcount = numpy.zeros(full, dtype=numpy.int8)
+    for j in range(k):
+        popcount += (masks >> j) & 1
+    for size in range(2, k + 1):
+        layer = masks[popcount == size]
+        for j in range(1, k + 1):
+            bit = 1 << (j - 1)
+            current = layer[(layer & bit) != 0]
+            previous = current ^ bit
+            for q, sources, leg in groups[j]:
+                # fields of goals outside previous subset keep infinity, so they are never the cheapest
+                candidates = dp[previous][:, sources - 1] + leg
+                best = candidates.argmin(axis=1)
+                dp[current, q - 1] = candidates[numpy.arange(len(current)), best]
+                parent[current, q - 1] = sources[best]
+    # reconstruct order from the last field back to the start
+    mask = full - 1
+    if dp[mask].min() >= infinity:
+        return []
+    field = int(dp[mask].argmin()) + 1
+    order = []
+    while field != 0:
+        order.append(goals[field])
+        previous = int(parent[mask][field - 1])
+        mask ^= 1 << (goals[field] - 1)
+        field = previous
+    order.reverse()
+    return order
+
+
+# calculate cost of visiting goals in given order over fields goals are served from (DistanceTable.serving)
+def serving_cost(serving, order, unreachable=UNREACHABLE):
+    goals, costs, arrivals = serving
+    cost = 0
+    field = 0
+    for goal in order:
+        if arrivals[field][goal] == -1:
+            return cost + unreachable * (len(order) - order.index(goal))
+        cost += costs[field][goal]
+        field = arrivals[field][goal]
+    return cost
+
+
+# order goals greedily over fields goals are served from - always go to the nearest unvisited goal
+# from the field waiter stands on
+def serving_nearest_neighbour(serving):
+    goals, costs, arrivals = serving
+    unvisited = set(range(1, len(costs[0])))
+    order = []
+    field = 0
+    while unvisited:
+        goal = min(unvisited, key=lambda g: (costs[field][g], g))
+        unvisited.remove(goal)
+        order.append(goal)
+        if arrivals[field][goal] != -1:
+            field = arrivals[field][goal]
+    return order
+
+
+# order goals greedily - always go to the nearest unvisited goal
+def nearest_neighbour(distances):
+    unvisited = set(range(1, len(distances)))
+    order = []
+    current = 0
+    while unvisited:
+        current = min(unvisited, key=lambda goal: (distances[current][goal], goal))
+        unvisited.remove(current)
+        order.append(current)
+    return order
+
+
+# exact depth-first branch and bound, nearest goals are tried first. Not visited goals can not be reached cheaper
+# than by the cheapest edge from current goal and minimum spanning tree of them (over the cheaper direction
+# of every edge) - trees are remembered by set of goals. The first solution is nearest neighbour order improved
+# by local search; when budget (seconds) runs out, the best order found so far is returned
+def branch_and_bound(distances, budget=None):
+    k = len(distances) - 1
+    deadline = time.time() + budget if budget is not None else None
+    best_order = nearest_neighbour(distances)
+    best_cost = order_cost(distances, best_order)
+    # moves of local search assume symmetric distances - number of its iterations is limited, real costs are compared
+    for order in anytime_order(distances, budget=None, iterations=len(distances) ** 2):
+        if order_cost(distances, order) < best_cost:
+            best_order, best_cost = order, order_cost(distances, order)
+    d = numpy.array(distances, dtype=numpy.int64)
+    symmetric = numpy.minimum(d, d.T)
+    trees = dict()
+
+    # weight of minimum spanning tree of goals of mask (Prim)
+    def spanning_tree(mask):
+        if mask not in trees:
+            nodes = [goal for goal in range(1, k + 1) if mask >> goal & 1]
+            weights = symmetric[numpy.ix_(nodes, nodes)]
+            inside = numpy.zeros(len(nodes), dtype=bool)
+            inside[0] = True
+            cheapest = weights[0].copy()
+            total = 0
+            for _ in range(len(nodes) - 1):
+                cheapest[inside] = numpy.iinfo(numpy.int64).max
+                node = int(cheapest.argmin())
+                total += int(cheapest[node])
+                inside[node] = True
+                numpy.minimum(cheapest, weights[node], out=cheapest)
+            trees[mask] = total
+        return trees[mask]
+
+    order = []
+    expanded = 0
+
+    def expand(current, cost, mask):
+        nonlocal best_order, best_cost, expanded
+        if not mask:
+            if cost < best_cost:
+                best_cost = cost
+                best_order = order[:]
+            return
+        expanded += 1
+        if deadline is not None and expanded % 256 == 0 and time.time() >= deadline:
+            raise TimeoutError
+        goals = sorted((goal for goal in range(1, k + 1) if mask >> goal & 1), key=lambda g: distances[current][g])
+        for goal in goals:
+            new_cost = cost + distances[current][goal]
+            rest = mask & ~(1 << goal)
+            bound = new_cost
+            if rest:
+                bound += min(distances[goal][g] for g in goals if g != goal) + spanning_tree(rest)
+            # prune branches which can not beat the best solution found so far
+            if bound >= best_cost:
+                continue
+            order.append(goal)
+            expand(goal, new_cost, rest)
+            order.pop()
+
+    try:
+        expand(0, 0, (1 << (k + 1)) - 2)
+    except TimeoutError:
+        pass
+    return best_order
+
+
+# //////////////////////////////////////////////////
+#           E X H A U S T I V E   O R D E R I N G
+
+# the cheapest of all orders starting with prefix, as pair (cost, order) - pure function run by worker processes
+def best_permutation(distances, prefix):
+    rest = [goal for goal in range(1, len(distances)) if goal not in prefix]
+    prefix_cost = order_cost(distances, prefix)
+    last = prefix[-1] if prefix else 0
+    best = None
+    for tail in itertools.permutations(rest):
+        cost = prefix_cost
+        previous = last
+        for goal in tail:
+            cost += distances[previous][goal]
+            previous = goal
+        if best is None or cost < best[0]:
+            best = (cost, list(prefix) + list(tail))
+    return best
+
+
+# evaluate all permutations of goals - chunks of permutations sharing the first goals are fanned out
+# over process pool and the cheapest order is chosen in parent process
+def exhaustive_order(distances, workers=None):
+    k = len(distances) - 1
+    if k < EXHAUSTIVE_PARALLEL_LIMIT or workers == 1:
+        return best_permutation(distances, [])[1]
+    # chunks - all orders starting with the same two goals
+    prefixes = [[a, b] for a in range(1, k + 1) for b in range(1, k + 1) if a != b]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(best_permutation, itertools.repeat(distances), prefixes,
+                                    chunksize=max(1, len(prefixes) // (4 * (workers or os.cpu_count() or 1)))))
+    # ties are broken by order itself, so the result does not depend on number of workers
+    return min(results)[1]
+
+
+# //////////////////////////////////////////////////
+#           A N Y T I M E   O R D E R I N G
+# local search over orders - distances between goals have to be symmetric
+
+# change of cost after reversing goals path[i..j] of path (start and goals, start at index 0)
+def two_opt_delta(distances, path, i, j):
+    delta = distances[path[i - 1]][path[j]] - distances[path[i - 1]][path[i]]
+    if j + 1 < len(path):
+        delta += distances[path[i]][path[j + 1]] - distances[path[j]][path[j + 1]]
+    return delta
+
+
+# change of cost after moving segment path[i..i+length-1] of path behind goal path[m]
+def or_opt_delta(distances, path, i, length, m):
+    first, last = path[i], path[i + length - 1]
+    # cost of closing the gap after segment
+    delta = -distances[path[i - 1]][first]
+    if i + length < len(path):
+        delta += distances[path[i - 1]][path[i + length]] - distances[last][path[i + length]]
+    # cost of opening the gap for segment
+    delta += distances[path[m]][first]
+    if m + 1 < len(path):
+        delta += distances[last][path[m + 1]] - distances[path[m]][path[m + 1]]
+    return delta
+
+
+# move segment path[i..i+length-1] of path behind goal path[m]
+def or_opt_move(path, i, length, m):
+    segment = path[i:i + length]
+    rest = path[:i] + path[i + length:]
+    position = m + 1 if m < i else m + 1 - length
+    return rest[:position] + segment + rest[position:]
+
+
+# all 2-opt and or-opt moves of path, as pairs (delta, function making new path)
+def neighbourhood_moves(distances, path):
+    for i in range(1, len(path) - 1):
+        for j in range(i + 1, len(path)):
+            yield two_opt_delta(distances, path, i, j), \
+                lambda i=i, j=j: path[:i] + path[i:j + 1][::-1] + path[j + 1:]
+    for length in (1, 2, 3):
+        for i in range(1, len(path) - length + 1):
+            for m in range(len(path)):
+                if m < i - 1 or m >= i + length:
+                    yield or_opt_delta(distances, path, i, length, m), \
+                        lambda i=i, length=length, m=m: or_opt_move(path, i, length, m)
+
+
+# one random 2-opt or or-opt move of path, as pair (delta, function making new path)
+def random_move(distances, path, generator):
+    if generator.random() < 0.5:
+        i = generator.randrange(1, len(path) - 1)
+        j = generator.randrange(i + 1, len(path))
+        return two_opt_delta(distances, path, i, j), lambda: path[:i] + path[i:j + 1][::-1] + path[j + 1:]
+    length = generator.randint(1, min(3, len(path) - 2))
+    i = generator.randrange(1, len(path) - length + 1)
+    positions = [m for m in range(len(path)) if m < i - 1 or m >= i + length]
+    if not positions:
+        return 0, lambda: path
+    m = generator.choice(positions)
+    return or_opt_delta(distances, path, i, length, m), lambda: or_opt_move(path, i, length, m)
+
+
+# anytime ordering: starts from nearest neighbour order and improves it with 2-opt and or-opt moves
+# until local optimum is reached, then optionally continues with simulated annealing,
+# until wall-clock budget (seconds) or number of iterations runs out.
+# Generator - yields every order better than all the previous ones, so the best order found so far is always known
+def anytime_order(distances, budget=1.0, iterations=None, annealing=False, seed=None):
+    deadline = time.time() + budget if budget is not None else None
+    generator = random.Random(seed)
+    path = [0] + nearest_neighbour(distances)
+    cost = best_cost = order_cost(distances, path[1:])
+    yield path[1:]
+    if len(path) < 3:
+        return
+    temperature = max(1.0, 0.2 * cost / len(path))
+    local_optimum = False
+    iteration = 0
+    while (deadline is None or time.time() < deadline) and (iterations is None or iteration < iterations):
+        iteration += 1
+        if not local_optimum:
+            # first improving move
+            delta, move = next(((delta, move) for delta, move in neighbourhood_moves(distances, path) if delta < 0),
+                               (0, None))
+            if move is None:
+                local_optimum = True
+                if not annealing:
+                    return
+                continue
+        else:
+            # random move, accepted if it is better or with probability decreasing with temperature
+            delta, move = random_move(distances, path, generator)
+            temperature = max(temperature * 0.9995, 1e-3)
+            if delta > 0 and generator.random() >= math.exp(-delta / temperature):
+                continue
+        path = move()
+        cost += delta
+        if cost < best_cost:
+            best_cost = cost
+            yield path[1:]
+
+
+# choose exact solver suitable for number of goals - branch and bound returns the best order found
+# when budget (seconds) runs out. With fields goals are served from (DistanceTable.serving) routes are solved
+# over them, beyond Held-Karp limit order of branch and bound is kept only if it beats greedy order over them
+def solve_order(distances, budget=None, serving=None):
+    if len(distances) - 1 <= HELD_KARP_LIMIT:
+        order = held_karp_fields(*serving) if serving is not None else []
+        return order or held_karp(distances)
+    order = branch_and_bound(distances, budget)
+    if serving is not None:
+        order = min(order, serving_nearest_neighbour(serving), key=lambda o: serving_cost(serving, o))
+    return order
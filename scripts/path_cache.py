@@ -0,0 +1,99 @@
+# path cache object class:
+# content-addressed cache of solutions - movement vectors of waiter (and chosen order of goals) are kept under
+# hash of restaurant layout and solving parameters, in memory of process and in directory on disk.
+# Number of entries on disk is capped - the least recently used entries are removed first.
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+
+class PathCache:
+    # memo shared by all caches of process - solutions of the same scenario are not read from disk twice
+    memo = OrderedDict()
+    memo_capacity = 256
+
+    # init cache in directory, keeping at most capacity entries on disk
+    def __init__(self, directory, capacity=1024):
+        self.directory = directory
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    # key of solution - hash of all given parts (size of restaurant, layout, solving method...)
+    @staticmethod
+    def key(*parts):
+        digest = hashlib.sha1()
+        for part in parts:
+            digest.update(part if isinstance(part, bytes) else repr(part).encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    # file of entry on disk
+    def filename(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    # remember entry in memo of process, forgetting the least recently used ones
+    def remember(self, key, value):
+        self.memo[key] = value
+        self.memo.move_to_end(key)
+        while len(self.memo) > self.memo_capacity:
+            self.memo.popitem(last=False)
+
+    # solution stored under key or None - memo is checked first, then disk
+    def get(self, key):
+        if key in self.memo:
+            self.memo.move_to_end(key)
+            self.hits += 1
+            return self.memo[key]
+        try:
+            with open(self.filename(key)) as file:
+                value = json.load(file)
+            # mark entry as recently used
+            os.utime(self.filename(key))
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.remember(key, value)
+        self.hits += 1
+        return value
+
+    # store solution under key, in memo and on disk - memo keeps its own copy, so later changes of value
+    # (waiter consumes his path move by move) never reach the cache
+    def put(self, key, value):
+        encoded = json.dumps(value)
+        self.remember(key, json.loads(encoded))
+        # write to temporary file first, so other processes never read half-written entry
+        temporary = self.filename(key) + '.%s.tmp' % os.getpid()
+        try:
+            with open(temporary, 'w') as file:
+                file.write(encoded)
+            os.replace(temporary, self.filename(key))
+        except OSError as e:
+            print("PathCache: could not save entry %s (%s)" % (key, e))
+            return
+        self.evict()
+
+    # remove the least recently used entries above capacity from disk
+    def evict(self):
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')]
+        except OSError:
+            return
+        if len(entries) <= self.capacity:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.capacity]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    # remove all entries, from memo and from disk
+    def clear(self):
+        self.memo.clear()
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                os.remove(entry.path)
@@ -0,0 +1,58 @@
+# policy cache object class:
+# moves predicted by learned policies (rabbit, svm, dtree...) for neighbourhoods of waiter. Neighbourhood is packed
+# to one integer (3 bits per field, see FeatureEncoder.key), so a neighbourhood seen before costs one dictionary
+# lookup instead of prediction of model. The least recently used neighbourhoods are forgotten first.
+
+from collections import OrderedDict
+
+
+class PolicyCache:
+    # init cache keeping at most capacity neighbourhoods
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.moves = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # move predicted for neighbourhood packed to key - remembered one, or the one returned by predict()
+    # called only on miss
+    def move(self, key, predict):
+        if key in self.moves:
+            self.moves.move_to_end(key)
+            self.hits += 1
+            return self.moves[key]
+        self.misses += 1
+        move = predict()
+        self.moves[key] = move
+        while len(self.moves) > self.capacity:
+            self.moves.popitem(last=False)
+        return move
+
+    # moves predicted for many neighbourhoods packed to keys at once - predict(indices) is called once with
+    # indices of keys not remembered yet (every key only once) and returns their moves in the same order
+    def move_all(self, keys, predict):
+        moves = [None] * len(keys)
+        missing = dict()
+        for index, key in enumerate(keys):
+            if key in self.moves:
+                self.moves.move_to_end(key)
+                self.hits += 1
+                moves[index] = self.moves[key]
+            elif key not in missing:
+                missing[key] = index
+                self.misses += 1
+        if missing:
+            predicted = dict(zip(missing, predict(list(missing.values()))))
+            self.moves.update(predicted)
+            while len(self.moves) > self.capacity:
+                self.moves.popitem(last=False)
+            for index, key in enumerate(keys):
+                if moves[index] is None:
+                    moves[index] = predicted[key]
+        return moves
+
+    # statistics of cache as text
+    def stats(self):
+        total = self.hits + self.misses
+        return "%s hits, %s misses (%.0f%% hit rate), %s neighbourhoods" \
+               % (self.hits, self.misses, 100.0 * self.hits / total if total else 0.0, len(self.moves))
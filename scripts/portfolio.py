@@ -0,0 +1,101 @@
+# portfolio of solving methods:
+# the same route (start and ordered goals) is solved by several searches at once, every one in its own process.
+# The shortest route found until deadline is kept - or the first one which is certified optimal,
+# then remaining workers are terminated at once. Functions of this file are pure, so they can run in any process.
+
+import datetime
+import multiprocessing
+import queue
+import time
+
+from scripts.grid_graph import *
+
+
+# join legs found by leg(standing, row) between consecutive goals (rows of distance table) into list of cells,
+# waiter does not enter served object - he comes back to the field he served it from
+# returns list of cells and row of goal which could not be reached (None if all of them were reached)
+def stitch_cells(table, standing, rows, leg):
+    cells = [standing]
+    for row in rows:
+        # do not search for legs known to be impossible
+        segment = leg(standing, row) if table.distance(row, standing) != -1 else []
+        # one-cell leg - goal is on the field waiter stands on, so it can not be served from any field
+        if len(segment) < 2:
+            return cells, row
+        standing = segment[-2]
+        cells.extend(segment[1:] + [standing])
+    # the last coming back is never executed
+    if rows:
+        cells.pop()
+    return cells, None
+
+
+# lower bound of number of cells of route - the first leg is known exactly, every next one starts on one
+# of floor fields next to previous goal, so it is not shorter than the shortest leg from any of them
+def route_bound(table, standing, rows):
+    bound = 0
+    previous = None
+    for row in rows:
+        if previous is None:
+            distance = table.distance(row, standing)
+        else:
+            distance = min((table.distance(row, cell) for cell in table.graph.adjacent(table.sources[previous])
+                            if table.graph.passable[cell] == FLOOR and table.distance(row, cell) != -1),
+                           default=table.cost(previous, row) - 1)
+        bound += distance + 1
+        previous = row
+    return bound
+
+
+# worker of portfolio - solves route with search(graph, start, goal) and puts (method, cells, time) to queue,
+# cells are empty if some goal could not be reached
+def solve_route(results, method, search, graph, table, standing, rows):
+    starttime = time.time()
+    cells, failed = stitch_cells(table, standing, rows, lambda start, row: search(graph, start, table.sources[row]))
+    results.put((method, cells if failed is None else [], time.time() - starttime))
+
+
+# race of searches (method -> (search, graph)) solving the same route, returns method, cells and time
+# of the winner (None if no search found route) and times of all finished searches by method
+# after deadline (in seconds) the first route found is taken, if there was none before
+def race(searches, table, standing, rows, deadline=1.0):
+    optimum = route_bound(table, standing, rows)
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=solve_route, args=(results, method, search, graph, table, standing, rows),
+                                       daemon=True)
+               for method, (search, graph) in searches.items()]
+    for worker in workers:
+        worker.start()
+    end = time.time() + deadline
+    best = None
+    finished = dict()
+    while len(finished) < len(workers):
+        try:
+            method, cells, elapsed = results.get(timeout=0.05)
+        except queue.Empty:
+            # workers which crashed never report
+            if not any(worker.is_alive() for worker in workers) and results.empty():
+                break
+            if best is not None and time.time() >= end:
+                break
+            continue
+        finished[method] = elapsed
+        if cells and (best is None or len(cells) < len(best[1])):
+            best = (method, cells, elapsed)
+        if best is not None and (len(best[1]) <= optimum or time.time() >= end):
+            break
+    for worker in workers:
+        if worker.is_alive():
+            worker.terminate()
+        worker.join()
+    return best, finished
+
+
+# append winner of race to log of portfolio (tab separated, like simulation log) for tuning of solvers
+def record(filename, n, goals, winner, length, elapsed, certified):
+    try:
+        with open(filename, "a") as myfile:
+            myfile.write(str(datetime.datetime.now()) + '\t' + str(n) + '\t' + str(goals) + '\t' + winner + '\t'
+                         + str(length) + '\t' + '{0:.4f}'.format(elapsed) + '\t' + str(certified) + '\n')
+    except OSError as e:
+        print("Portfolio: could not record winner (%s)" % e)
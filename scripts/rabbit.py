@@ -0,0 +1,211 @@
+# rabbit object class:
+# long-lived predictor of Vowpal Wabbit one-against-all model (data/rabbit.model). Examples are streamed over pipes
+# to one vw process, started once per predictor - no files are written, so simulations never share any state.
+# When vw is not installed, examples are scored in process: weights are read from the same binary model
+# and features are hashed like in vw (murmurhash3), so both backends give the same predictions.
+
+import shutil
+import struct
+import subprocess
+from collections import OrderedDict
+
+import numpy
+
+# hash of constant feature of vw
+CONSTANT = 11650396
+
+
+# 32-bit murmurhash3 (x86) of bytes - hash function of feature names in vw
+def murmurhash3(data, seed=0):
+    h = seed & 0xffffffff
+    length = len(data)
+    for i in range(0, length - length % 4, 4):
+        k = int.from_bytes(data[i:i + 4], 'little')
+        k = (k * 0xcc9e2d51) & 0xffffffff
+        k = ((k << 15) | (k >> 17)) & 0xffffffff
+        k = (k * 0x1b873593) & 0xffffffff
+        h ^= k
+        h = ((h << 13) | (h >> 19)) & 0xffffffff
+        h = (h * 5 + 0xe6546b64) & 0xffffffff
+    tail = data[length - length % 4:]
+    if tail:
+        k = int.from_bytes(tail, 'little')
+        k = (k * 0xcc9e2d51) & 0xffffffff
+        k = ((k << 15) | (k >> 17)) & 0xffffffff
+        k = (k * 0x1b873593) & 0xffffffff
+        h ^= k
+    h ^= length
+    h ^= h >> 16
+    h = (h * 0x85ebca6b) & 0xffffffff
+    h ^= h >> 13
+    h = (h * 0xc2b2ae35) & 0xffffffff
+    h ^= h >> 16
+    return h
+
+
+# hash of feature or namespace name like in vw - names made of digits are numbers, the others are hashed
+def hash_name(name, seed=0):
+    if name.isdigit():
+        return (int(name) + seed) & 0xffffffff
+    return murmurhash3(name.encode(), seed)
+
+
+# example in vw text format of row of feature values with names, for example "| 0x0:1 0x1:4 ..."
+def vw_example(names, row):
+    return "| " + " ".join("{}:{}".format(name, int(value)) for name, value in zip(names, row))
+
+
+class Rabbit:
+    # weights of models read by local backend, by filename
+    models = OrderedDict()
+    models_capacity = 8
+
+    # init predictor of model - backend is "vw", "local" or None (vw if it is installed, local otherwise)
+    def __init__(self, model, backend=None):
+        self.model = model
+        self.process = None
+        if backend is None:
+            backend = "vw" if shutil.which('vw') else "local"
+        if backend == "vw":
+            try:
+                # predictions are written to standard output, one line per example
+                self.process = subprocess.Popen(['vw', '-i', model, '-t', '-p', '/dev/stdout', '--quiet'],
+                                                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                                universal_newlines=True, bufsize=1)
+            except OSError as e:
+                print("Rabbit: could not run vw (%s), using local backend" % e)
+                backend = "local"
+        self.backend = backend
+        if backend == "local":
+            self.classes, self.bits, self.weights = self.load(model)
+            # weights of classes are interleaved - stride is the lowest power of two not smaller than number of classes
+            self.stride = 1
+            while self.stride < self.classes:
+                self.stride *= 2
+            self.mask = (1 << self.bits) - 1
+            # hashes of features seen so far - neighbourhoods use the same few names every step
+            self.hashes = dict()
+            # weights of named features for all classes, by names
+            self.tables = dict()
+        print("Rabbit: %s backend ready." % self.backend)
+
+    # weights of model read from binary model file of vw (without saved learning state) - number of classes,
+    # number of bits and dictionary of weights by index
+    @classmethod
+    def load(cls, model):
+        if model not in cls.models:
+            with open(model, 'rb') as file:
+                content = file.read()
+            cls.models[model] = cls.parse(content)
+            while len(cls.models) > cls.models_capacity:
+                cls.models.popitem(last=False)
+        cls.models.move_to_end(model)
+        return cls.models[model]
+
+    # parse content of binary model file of vw
+    @staticmethod
+    def parse(content):
+        offset = 0
+
+        def read(size):
+            nonlocal offset
+            if offset + size > len(content):
+                raise ValueError("model file is too short")
+            offset += size
+            return content[offset - size:offset]
+
+        def read_int():
+            return struct.unpack('<I', read(4))[0]
+
+        read(read_int())  # version
+        if read(1) != b'm':
+            raise ValueError("not a vw model file")
+        read(8)  # minimal and maximal label
+        bits = read_int()
+        read(4)  # lda
+        read(2 * read_int())  # pairs
+        read(3 * read_int())  # triples
+        options = read(read_int()).rstrip(b'\0').decode().split()
+        read(read_int())  # checksum
+        if read(1) != b'\0':
+            raise ValueError("models with learning state are not supported")
+        if '--oaa' not in options:
+            raise ValueError("only one-against-all models are supported")
+        classes = int(options[options.index('--oaa') + 1])
+        weights = dict()
+        index_format = '<I' if bits < 32 else '<Q'
+        index_size = struct.calcsize(index_format)
+        while offset < len(content):
+            index = struct.unpack(index_format, read(index_size))[0]
+            weights[index] = struct.unpack('<f', read(4))[0]
+        return classes, bits, weights
+
+    # predicted class (1..number of classes) of example in vw text format, for example "| 0x0:1 0x1:4"
+    def predict(self, example):
+        if self.process is not None:
+            self.process.stdin.write(example.replace('\n', ' ') + '\n')
+            self.process.stdin.flush()
+            return int(round(float(self.process.stdout.readline().split()[0])))
+        return self.score(example)
+
+    # predicted classes of many examples - examples are streamed to vw in chunks, predictions of whole chunk
+    # are read afterwards (chunks keep pipes from filling up while vw waits for its output to be read)
+    def predict_all(self, examples, chunk=1024):
+        if self.process is None:
+            return [self.score(example) for example in examples]
+        classes = []
+        for start in range(0, len(examples), chunk):
+            part = examples[start:start + chunk]
+            self.process.stdin.write(''.join(example.replace('\n', ' ') + '\n' for example in part))
+            self.process.stdin.flush()
+            classes.extend(int(round(float(self.process.stdout.readline().split()[0]))) for _ in part)
+        return classes
+
+    # local one-against-all prediction - class with the highest linear score, the first one on ties
+    def score(self, example):
+        features = [(CONSTANT, 1.0)]
+        for part in example.split('|')[1:]:
+            tokens = part.split()
+            channel = 0
+            scale = 1.0
+            if tokens and not part.startswith((' ', '\t')):
+                # namespace name (with optional scale of its values) right after bar
+                name, _, scale = tokens.pop(0).partition(':')
+                channel = hash_name(name)
+                scale = float(scale) if scale else 1.0
+            for token in tokens:
+                name, _, value = token.partition(':')
+                key = (name, channel)
+                if key not in self.hashes:
+                    self.hashes[key] = hash_name(name, channel)
+                features.append((self.hashes[key], scale * (float(value) if value else 1.0)))
+        scores = [sum(value * self.weight(feature, label) for feature, value in features)
+                  for label in range(self.classes)]
+        return scores.index(max(scores)) + 1
+
+    # weight of hashed feature for class (0..number of classes - 1)
+    def weight(self, feature, label):
+        return self.weights.get((feature * self.stride + label) & self.mask, 0.0)
+
+    # predicted classes of rows of feature values (array of shape (rows, names)) with names - local backend
+    # scores all rows with one product of matrices, without building any examples
+    def predict_rows(self, rows, names):
+        if self.process is not None:
+            return self.predict_all([vw_example(names, row) for row in rows])
+        names = tuple(names)
+        if names not in self.tables:
+            # the last row of table belongs to constant feature
+            features = [hash_name(name) for name in names] + [CONSTANT]
+            self.tables[names] = numpy.array([[self.weight(feature, label) for label in range(self.classes)]
+                                              for feature in features])
+        table = self.tables[names]
+        scores = numpy.asarray(rows, dtype=numpy.float64) @ table[:-1] + table[-1]
+        # argmax takes the first class on ties, like score()
+        return [int(label) + 1 for label in scores.argmax(axis=1)]
+
+    # stop vw process
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+            self.process = None
@@ -0,0 +1,54 @@
+# snapshot object class:
+# immutable, compact state of matrix at given version - one bytes object with types of cells
+# and one with states of objects per row of matrix. Rows which did not change since previous snapshot
+# are shared between snapshots, so taking snapshot costs only as much as the number of changed rows.
+
+import numpy
+
+
+class Snapshot:
+    __slots__ = ('version', 'cells', 'states')
+
+    # init snapshot with version of matrix and tuples of rows (bytes) with types of cells and states of objects
+    def __init__(self, version, cells, states):
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'cells', tuple(cells))
+        object.__setattr__(self, 'states', tuple(states))
+
+    # snapshots can not be modified
+    def __setattr__(self, key, value):
+        raise AttributeError("Snapshot: snapshots are immutable")
+
+    def __repr__(self):
+        return "Snapshot(version=%s, size=%s)" % (self.version, len(self.cells))
+
+    def __eq__(self, other):
+        return isinstance(other, Snapshot) and self.cells == other.cells and self.states == other.states
+
+    def __hash__(self):
+        return hash((self.cells, self.states))
+
+    # type of cell on coordinates
+    def cell(self, x, y):
+        return self.cells[x][y]
+
+    # state of object on coordinates, 0 for cells without state
+    def state(self, x, y):
+        return self.states[x][y]
+
+    # types of all cells as numpy array
+    def to_array(self):
+        return numpy.frombuffer(b''.join(self.cells), dtype=numpy.uint8).reshape(len(self.cells), -1)
+
+    # list of changes between this snapshot and other one: (x, y, old cell, new cell, old state, new state)
+    def diff(self, other):
+        changes = []
+        for x, (cells, states, other_cells, other_states) in enumerate(zip(self.cells, self.states,
+                                                                          other.cells, other.states)):
+            # shared rows did not change
+            if cells is other_cells and states is other_states:
+                continue
+            for y in range(len(cells)):
+                if cells[y] != other_cells[y] or states[y] != other_states[y]:
+                    changes.append((x, y, cells[y], other_cells[y], states[y], other_states[y]))
+        return changes
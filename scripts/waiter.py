@@ -1,13 +1,9 @@
 # -*- coding: utf-8 -*-
 # agent object class:
 
-import itertools
 import sys
 import time
-import math
-import heapq
 from os import path
-from numpy import ndarray
 import numpy
 import random
 from sklearn import svm
@@ -15,9 +11,18 @@ from sklearn import tree
 from pygame.locals import *
 from operator import add
 
-from UberKelner import init_graphics, blocksize
+from scripts.graphics import init_graphics, blocksize
 from scripts.matrix import *
 from scripts.wall import *
+from scripts.ordering import *
+from scripts.distance_table import *
+from scripts.path_cache import *
+from scripts.landmarks import *
+from scripts.portfolio import *
+from scripts.rabbit import *
+from scripts.model_store import *
+from scripts.policy import *
+from scripts.features import *
 
 import os
 
@@ -34,7 +39,9 @@ class Waiter (pygame.sprite.Sprite):
         return "W"
 
     # initialize agent with list of coordinates for tables and furnaces and their number
-    def __init__(self, n, matrix_fields, num_tables, num_furnaces, num_walls, solving_method):
+    # waiter may join restaurant shared with other waiters - then its path is planned by their fleet
+    def __init__(self, n, matrix_fields, num_tables, num_furnaces, num_walls, solving_method,
+                 ordering="exact", budget=1.0, cache=None, restaurant=None):
         print("Agent: initializing object...")
 
         # call init of parent class
@@ -48,7 +55,8 @@ class Waiter (pygame.sprite.Sprite):
         self.n = n
 
         # init restaurant - matrix of objects
-        self.restaurant = Matrix(n, n)
+        self.shared = restaurant is not None
+        self.restaurant = restaurant if self.shared else Matrix(n, n)
 
         # set random coordinates of agent
         self.x, self.y = matrix_fields[0][0], matrix_fields[0][1]
@@ -56,43 +64,40 @@ class Waiter (pygame.sprite.Sprite):
         # init graphics with object's sprite - do not touch!
         init_graphics(self, self.x, self.y, "waiter")
 
-        # add objects to restaurant - creates tables and furnaces basing on random positions in the matrix
-        # objects have coordinates like in matrix (0..n, 0..n):
-
         # add ghostwaiter to restaurant to mark waiters position
         self.restaurant.insert('W', self.x, self.y)
 
-        # counter counts number of used coordinates, so no object will occupy the same space in simulation
-        counter = 1
-
-        # add tables
-        for i in range(num_tables):
-            self.restaurant.simple_insert(DinningTable(matrix_fields[i + counter][0], matrix_fields[i + counter][1]))
-
-        # increase counter with number of used coordinates
-        counter += num_tables
+        # add objects to restaurant, unless they are already in shared one
+        # counter counts number of used coordinates of waiter, tables and furnaces
+        if self.shared:
+            counter = 1 + num_tables + num_furnaces
+        else:
+            counter = self.furnish(self.restaurant, matrix_fields, num_tables, num_furnaces, num_walls)
 
-        # add furnaces
-        for i in range(num_furnaces):
-            self.restaurant.simple_insert(Furnace(matrix_fields[i + counter][0], matrix_fields[i + counter][1]))
+        # calculate graph - from now on restaurant keeps it up to date and reports changes of it
+        # (waiters sharing restaurant share its graph too)
+        self.graph = self.restaurant.compact_graph if self.shared else self.restaurant.to_compact_graph()
+        self.restaurant.graph_listeners.append(self.restaurant_changed)
+        # set list of objects
+        self.objects_coordinates = matrix_fields[1:counter]
+        # set list of goals - goals which can not be reached are reported at once and skipped by solvers
+        self.unreachable_goals = []
+        self.goals = self.reachable_goals()
 
-        # increase counter with number of used coordinates
-        counter += num_furnaces
+        # set order of visiting goals chosen by goal ordering engine
+        self.goal_order = []
 
-        # add furnaces
-        for i in range(num_walls):
-            self.restaurant.simple_insert(Wall(matrix_fields[i + counter][0], matrix_fields[i + counter][1]))
+        # set goal ordering method (exact, exhaustive, anytime, annealing) and time budget of anytime ordering
+        self.available_orderings = ['exact', 'exhaustive', 'anytime', 'annealing']
+        self.ordering = ordering if ordering in self.available_orderings else 'exact'
+        self.budget = budget
 
-        # calculate graph
-        self.graph = self.restaurant.to_graph()
-        self.graph2 = self.restaurant.to_graph_visited_or_not()
-        # set list of objects
-        self.objects_coordinates = matrix_fields[1:counter]
-        # set list of goals
-        self.goals = self.objects_coordinates[:]
+        # set distances and shortest paths between waiter and goals
+        self.distance_table = None
+        self.goal_rows = dict()
 
-        # set permutations of goals
-        self.goalsPer = list(map(list, list(itertools.permutations(self.goals[:]))))
+        # set cache of solutions (PathCache), solutions are not cached if it is None
+        self.cache = cache
 
         # set list of solutions
         self.solutions = []
@@ -101,15 +106,21 @@ class Waiter (pygame.sprite.Sprite):
         self.path = []
 
         # set all available solving methods names
-        self.available_methods = ['depthfs', 'breadthfs', 'bestfs']
+        self.available_methods = ['depthfs', 'breadthfs', 'bestfs', 'astar', 'hpastar', 'jps', 'alt']
         self.unsupervised_learning = ['rabbit', 'svm', 'dtree', 'lreg']
+        # methods racing in portfolio (solving method "all") and log of their wins
+        self.portfolio = list(self.available_methods)
+        self.portfolio_log = path.join('data', 'portfolio_log.txt')
 
         # set unsupervised learning safety switch
         self.moves_queue = [[0, 0], [0, 0], [0, 0], [0, 0]]
 
-        # set neighbourhood
-        self.neighbourhood = []
+        # set size of neighbourhood
         self.neighbourhood_size = 5
+        # moves of learned policies for neighbourhoods seen before, by solving method
+        self.policy_caches = dict()
+        # features of neighbourhoods for learned policies
+        self.encoder = FeatureEncoder(self.neighbourhood_size)
 
         # set solving method
         self.solving_method = solving_method
@@ -117,26 +128,67 @@ class Waiter (pygame.sprite.Sprite):
         # svm model variable
         self.svm_data = []
         self.svm_target = []
-        if self.solving_method == 'svm':
+        # vowpal wabbit predictor, started once per waiter
+        self.rabbit = None
+        if self.solving_method == 'rabbit':
+            self.init_rabbit()
+        elif self.solving_method == 'svm':
             self.init_svm()
         elif self.solving_method == "dtree":
             self.init_dtree()
 
-        # run solution seeking
-        self.solve(self.solving_method)
-        self.control = True
+        # run solution seeking - paths of waiters sharing restaurant are planned by their fleet
+        if not self.shared:
+            self.solve(self.solving_method)
+        # learned policies predict only the next move - model is asked again in every round
+        self.control = self.solving_method not in self.unsupervised_learning
 
         # add steps counter
         self.steps_count = 0
 
         print("Agent: initialization completed.")
 
+    # add objects to restaurant - creates tables, furnaces and walls basing on random positions in the matrix
+    # (the first position belongs to waiter), returns number of positions used by waiter, tables and furnaces
+    # objects have coordinates like in matrix (0..n, 0..n):
+    @staticmethod
+    def furnish(restaurant, matrix_fields, num_tables, num_furnaces, num_walls):
+        # counter counts number of used coordinates, so no object will occupy the same space in simulation
+        counter = 1
+
+        # add tables
+        for i in range(num_tables):
+            restaurant.simple_insert(DinningTable(matrix_fields[i + counter][0], matrix_fields[i + counter][1]))
+
+        # increase counter with number of used coordinates
+        counter += num_tables
+
+        # add furnaces
+        for i in range(num_furnaces):
+            restaurant.simple_insert(Furnace(matrix_fields[i + counter][0], matrix_fields[i + counter][1]))
+
+        # increase counter with number of used coordinates
+        counter += num_furnaces
+
+        # add walls
+        for i in range(num_walls):
+            restaurant.simple_insert(Wall(matrix_fields[i + counter][0], matrix_fields[i + counter][1]))
+
+        return counter
+
     # function returning list of coordinates of agent
     def get_coordinates(self):
         return [self.x, self.y]
 
     # movement procedure - change position of agent on defined difference of coordinates
     def move(self, delta_x, delta_y):
+        # wait in place - waiters sharing restaurant give way to each other
+        if delta_x == 0 and delta_y == 0:
+            if self.path:
+                self.path.pop(0)
+            self.steps_count = self.steps_count + 1
+            return
+
         # temporarily set new coordinates
         new_x = self.x + delta_x
         new_y = self.y + delta_y
@@ -188,12 +240,16 @@ class Waiter (pygame.sprite.Sprite):
 
         # activate AI agent on key SPACE:
         if key == K_SPACE:
-            self.get_svm_path()
             # check if agent left his path:
             if not self.control:
-                # run solution seeking
                 self.control = True
-                self.solve(self.solving_method)
+                if (self.solving_method in self.available_methods or self.solving_method == "all") \
+                        and self.distance_table is not None:
+                    # recover from deviation with distance fields of goals
+                    self.replan()
+                else:
+                    # run solution seeking
+                    self.solve(self.solving_method)
 
             # move agent on path
             if self.path:
@@ -228,10 +284,17 @@ class Waiter (pygame.sprite.Sprite):
             self.solving_method = method
 
             # reload lists
-            self.goals = self.objects_coordinates[:]
+            self.goals = self.reachable_goals()
             self.path = []
             self.solutions = []
 
+            # precompute leg costs for goal ordering
+            self.calculate_distance_table()
+
+            # solution of the same restaurant may be already known
+            if self.read_cached_path():
+                return
+
             # measure time
             starttime = time.time()
             print("Agent: %s path calculation executed..." % self.solving_method)
@@ -245,6 +308,18 @@ class Waiter (pygame.sprite.Sprite):
             elif self.solving_method == "bestfs":
                 # get bestfs path and add results to self.solutions
                 self.get_bestfs_path()
+            elif self.solving_method == "astar":
+                # get A* path and add results to self.solutions
+                self.get_astar_path()
+            elif self.solving_method == "hpastar":
+                # get hierarchical A* path and add results to self.solutions
+                self.get_hpastar_path()
+            elif self.solving_method == "jps":
+                # get jump point search path and add results to self.solutions
+                self.get_jps_path()
+            elif self.solving_method == "alt":
+                # get A* path with landmark heuristic and add results to self.solutions
+                self.get_alt_path()
 
             # print execution time
             print("Agent: %s path calculation execution complete "
@@ -256,6 +331,7 @@ class Waiter (pygame.sprite.Sprite):
                 # parse list to get coordinates of next moves
                 self.path = self.calculate_vector_movement(self.path)
                 print("Agent: path contains %s steps. " % len(self.path))
+                self.save_cached_path()
             else:
                 print("Agent: no %s path found!" % self.solving_method)
 
@@ -263,14 +339,8 @@ class Waiter (pygame.sprite.Sprite):
             # set solving method
             self.solving_method = method
             if self.goals:
-                if self.solving_method == "rabbit":
-                    self.get_rabbit_path()
-                elif self.solving_method == "svm":
-                    self.get_svm_path()
-                elif self.solving_method == "lreg":
-                    self.get_logistic_regression_path()
-                elif self.solving_method == "dtree":
-                    self.get_decision_tree_path()
+                # model is asked only for neighbourhoods not seen before
+                self.path = [list(self.policy_moves([(self.x, self.y)])[0])]
                 # because these methods calculate only one step (not the whole path),
                 # they should be called again for next move
                 self.control = False
@@ -284,167 +354,315 @@ class Waiter (pygame.sprite.Sprite):
                 self.next_switch()
             else:
                 print("Agent: No goals left!")
+                self.path = []
+                if self.solving_method in self.policy_caches:
+                    print("Agent: %s policy cache: %s" % (self.solving_method,
+                                                          self.policy_caches[self.solving_method].stats()))
+                # predictor is not needed any more - it is started again when new goals come
+                self.close()
 
         elif method == "all":
-            for method in self.available_methods:
-                self.solve(method)
+            self.solve_portfolio()
         else:
             print("Agent: Unknown method of solving (%s)" % method)
 
+    # Portfolio
+
+    # solve route with all methods of portfolio at once in worker processes - order of goals is solved once,
+    # the shortest path found until deadline (time budget) or the first one certified optimal is kept
+    # and its method is recorded in portfolio log
+    def solve_portfolio(self):
+        self.solving_method = "all"
+        self.goals = self.reachable_goals()
+        self.path = []
+        self.solutions = []
+        self.calculate_distance_table()
+        if self.read_cached_path():
+            return
+
+        starttime = time.time()
+        print("Agent: portfolio of %s methods executed..." % len(self.portfolio))
+        rows = self.get_goal_order()
+        self.goal_order = [self.goals[i - 1] for i in rows]
+        standing = self.graph.cell(self.x, self.y)
+        best, finished = race(self.searches(), self.distance_table, standing, rows, self.budget)
+        print("Agent: portfolio completed after {0:.2f} seconds, finished methods: %s."
+              .format(time.time() - starttime) % sorted(finished))
+        if best is None:
+            print("Agent: no portfolio path found!")
+            return
+        winner, cells, elapsed = best
+        certified = len(cells) <= route_bound(self.distance_table, standing, rows)
+        print("Agent: %s won portfolio after {0:.2f} seconds%s.".format(elapsed)
+              % (winner, ", path is optimal" if certified else ""))
+        record(self.portfolio_log, self.n, len(rows), winner, len(cells) - 1, elapsed, certified)
+
+        self.path = self.calculate_vector_movement(self.parse_cells_list([cells]))
+        print("Agent: path contains %s steps. " % len(self.path))
+        self.save_cached_path()
+
+    # searches of methods of portfolio with graphs they work on, search is called with graph, start and goal cells
+    def searches(self):
+        searches = {'depthfs': self.calculate_dfs_path, 'breadthfs': self.calculate_bfs_path,
+                    'bestfs': self.calculate_bestfs_path, 'astar': self.calculate_astar_path,
+                    'hpastar': self.calculate_hpastar_path, 'jps': self.calculate_jps_path,
+                    'alt': self.calculate_alt_path}
+        return {method: (searches[method],
+                         self.restaurant.to_hierarchical_graph() if method == "hpastar" else self.graph)
+                for method in self.portfolio}
+
+    # Learned policies
+
+    # cache of moves of current learned policy
+    def policy_cache(self):
+        return self.policy_caches.setdefault(self.solving_method, PolicyCache())
+
+    # moves of learned policy for positions (list of [x, y]) of restaurant, as if waiter stood on them -
+    # neighbourhoods not seen before are predicted together, with one call of model
+    def policy_moves(self, positions):
+        return self.policy_cache().move_all(self.encoder.keys(self.restaurant, positions, (self.x, self.y)),
+                                            lambda missing: [tuple(move) for move in
+                                                             self.predict_moves([positions[i] for i in missing])])
+
+    # moves predicted by model of learned policy for positions (list of [x, y]) of restaurant, as if waiter stood
+    # on them - neighbourhoods of all of them are encoded to one matrix of features and model is asked once
+    # (for waiters of fleet or all fields of restaurant)
+    def predict_moves(self, positions):
+        if self.solving_method == "rabbit":
+            moves = {
+                1: [0, -1],
+                2: [0, 1],
+                3: [-1, 0],
+                4: [1, 0],
+            }
+            if self.rabbit is None:
+                self.init_rabbit()
+            rows = self.encoder.encode(self.restaurant, positions, scale=1, waiter=(self.x, self.y))
+            return [moves.get(label) for label in self.rabbit.predict_rows(rows, self.encoder.names)]
+        elif self.solving_method in ("svm", "dtree"):
+            moves = {
+                'W': [0, -1],
+                'S': [0, 1],
+                'A': [-1, 0],
+                'D': [1, 0],
+            }
+            rows = self.encoder.encode(self.restaurant, positions, waiter=(self.x, self.y))
+            prediction = self.classifier().predict(rows)
+            return [moves.get(label) for label in prediction]
+        # logistic regression is not trained yet
+        return [[0, 0] for _ in positions]
+
+    # Reachability
+
+    # list of goals which can be reached from current position of waiter - connected components of restaurant
+    # are calculated once, so unreachable tables and furnaces are found without searching for any path
+    def reachable_goals(self):
+        cells = [self.graph.cell(x, y) for x, y in self.objects_coordinates]
+        reachable = self.graph.reachable(self.graph.cell(self.x, self.y), cells)
+        unreachable_goals = [goal for goal, flag in zip(self.objects_coordinates, reachable) if not flag]
+        if unreachable_goals and unreachable_goals != self.unreachable_goals:
+            print("Agent: goals unreachable from %s, skipped: %s" % (self.get_coordinates(), unreachable_goals))
+        self.unreachable_goals = unreachable_goals
+        return [goal for goal, flag in zip(self.objects_coordinates, reachable) if flag]
+
+    # Solution cache
+
+    # key of solution - restaurant layout (with position of waiter), goals, solving method and goal ordering
+    def cache_key(self):
+        return PathCache.key(self.n, self.restaurant.snapshot().cells, self.goals,
+                             self.solving_method, self.ordering, self.budget)
+
+    # set path and order of goals from cache, returns True if solution was found in cache
+    def read_cached_path(self):
+        if self.cache is None:
+            return False
+        solution = self.cache.get(self.cache_key())
+        if solution is None:
+            return False
+        self.path = [list(move) for move in solution['path']]
+        self.goal_order = [list(goal) for goal in solution['order']]
+        print("Agent: %s path read from cache, contains %s steps." % (self.solving_method, len(self.path)))
+        return True
+
+    # save path (movement vector) and order of goals to cache
+    def save_cached_path(self):
+        if self.cache is not None:
+            self.cache.put(self.cache_key(), {'path': [list(move) for move in self.path],
+                                              'order': [list(goal) for goal in self.goal_order]})
+
     # //////////////////////////////////////////////////
     #           S E A R C H E S
 
+    # Goal ordering
+
+    # precompute distances and shortest paths between waiter and all goals - one bfs flood per source
+    def calculate_distance_table(self):
+        cells = [self.graph.cell(self.x, self.y)] + [self.graph.cell(x, y) for x, y in self.goals]
+        self.distance_table = DistanceTable(self.graph, cells)
+        # rows of distance table with floods of goals
+        self.goal_rows = {tuple(goal): row for row, goal in enumerate(self.goals, 1)}
+
+    # calculate path visiting all goals: order of goals is solved as travelling salesman problem
+    # over distance table, grid search is used only to find legs between consecutive goals
+    # search is called with graph (compact graph of restaurant by default), start and goal cells
+    def get_ordered_path(self, search, graph=None):
+        graph = self.graph if graph is None else graph
+        cells = self.distance_table.sources
+        order = self.get_goal_order()
+        self.goal_order = [self.goals[i - 1] for i in order]
+        # add path to solutions
+        self.solutions.append(self.stitch_path(order, lambda standing, row: search(graph, standing, cells[row])))
+
+    # choose order of goals (rows of distance table) with chosen ordering method
+    def get_goal_order(self):
+        distances = self.distance_table.matrix(UNREACHABLE)
+        if self.ordering == "exact":
+            # beyond Held-Karp limit the best order found within time budget is taken, legs start on fields
+            # goals were served from
+            serving = self.distance_table.serving(range(len(distances)), UNREACHABLE)
+            return solve_order(distances, self.budget, serving)
+        if self.ordering == "exhaustive":
+            # all permutations of goals, evaluated in parallel
+            return exhaustive_order(distances)
+        # anytime ordering - improved until budget runs out, the best order found so far is always kept
+        order = []
+        for order in anytime_order(distances, self.budget, annealing=self.ordering == "annealing"):
+            self.goal_order = [self.goals[i - 1] for i in order]
+        print("Agent: %s ordering of %s goals costs %s steps." % (self.ordering, len(order),
+                                                                 order_cost(distances, order)))
+        return order
+
+    # join legs leading to goals of given rows of distance table into list of coordinates
+    def stitch_path(self, rows, leg):
+        cells, failed = stitch_cells(self.distance_table, self.graph.cell(self.x, self.y), rows, leg)
+        if failed is not None:
+            print("Agent: no path from %s to %s!" % (self.graph.coordinates(cells[-1]),
+                                                    self.graph.coordinates(self.distance_table.sources[failed])))
+            return []
+        return self.parse_cells_list([cells])
+
+    # incremental replanning - rebuild path from current position using distance fields of goals
+    # calculated during solving, instead of solving whole restaurant again
+    def replan(self):
+        # goals of chosen order still waiting for service and still reachable
+        reachable = self.reachable_goals()
+        rows = [self.goal_rows[tuple(goal)] for goal in self.goal_order
+                if goal in reachable and getattr(self.restaurant.get(goal[0], goal[1]), 'state', 0) != 0]
+        self.path = self.stitch_path(rows, lambda standing, row: self.distance_table.path_from(row, standing))
+        if len(self.path) > 0:
+            # parse list to get coordinates of next moves
+            self.path = self.calculate_vector_movement(self.path)
+            print("Agent: path replanned, contains %s steps. " % len(self.path))
+        else:
+            print("Agent: no path found while replanning!")
+
+    # repair cached paths after change of restaurant graph - only floods affected by changed cell are calculated
+    # again and the path is replanned only if it could have changed
+    def restaurant_changed(self, cell):
+        if self.distance_table is not None and self.distance_table.repair(cell):
+            print("Agent: restaurant changed at %s, repairing path..." % self.graph.coordinates(cell))
+            if self.solving_method in self.available_methods or self.solving_method == "all":
+                self.replan()
+
+    # parse list of legs (lists of graph cells) to one list of coordinates
+    def parse_cells_list(self, list_):
+        return [self.graph.coordinates(cell) for sublist in list_ for cell in sublist]
+
     # Depth-First Search
-    @staticmethod
-    def parse_dfs_list(list_):
-        # parse list to get coordinates of next moves
-        for e in list_:
-            for i in range(len(e)):
-                e[i] = list(map(int, e[i].split(',')))
-        # make list from list of lists
-        list_ = [item for sublist in list_ for item in sublist]
-        return list_
 
-    # recursive calculation of dfs path saved temporarly in self.path
-    def calculate_dfs_path(self, graph, start, goal):
-        stack = [(start, [start])]
-        while stack:
-            (vertex, tpath) = stack.pop()
-            for next_ in graph[vertex] - set(tpath):
-                if next_ == goal:
-                    # add path
-                    self.path.append(tpath)
-                    # remove goal and calculate next path
-                    try:
-                        temp = self.goals.pop(0)
-                        if self.goals:
-                            # call next goal
-                            self.calculate_dfs_path(self.graph, next_,
-                                                    str(self.goals[0][0]) + "," + str(self.goals[0][1]))
-                            # free memory
-                            del temp
-                        else:
-                            # add last goal to path
-                            self.path.append([str(temp[0]) + "," + str(temp[1])])
-                    except IndexError:
-                        print("Agent: map processing error - loop detected")
-                        self.path = [[]]
-                else:
-                    stack.append((next_, tpath + [next_]))
+    # calculation of dfs path between two cells, returns list of cells from start to goal or empty list
+    @staticmethod
+    def calculate_dfs_path(graph, start, goal):
+        return graph.depth_first(start, goal)
 
-    # procedure responsible of calculating all possible dfs paths
+    # procedure responsible of calculating dfs path through all goals
     def get_dfs_path(self):
-        # for all permutations of goals list:
-        for self.goals in copy.deepcopy(self.goalsPer):
-            # clear dfs_path and run next permutation
-            self.path = []
-            # calculate dfs
-            start = str(self.x) + "," + str(self.y)
-            goal = str(self.goals[0][0]) + "," + str(self.goals[0][1])
-            self.calculate_dfs_path(self.graph, start, goal)
-            # add parsed dfs_path to solutions
-            self.solutions.append(self.parse_dfs_list(self.path[:]))
-        # now self.solutions contains all solutions of dfs
+        self.get_ordered_path(self.calculate_dfs_path)
+        # now self.solutions contains solution of dfs
     # //////////////////////////////////////////////////
 
     # Breadth-First Search
 
-    # recursive calculation of dfs path saved temporarly in self.path
-    def calculate_bfs_path(self, graph, start, goal):
-        queue = [(start, [start])]
-        while queue:
-            (vertex, tpath) = queue.pop()
-            for next_ in graph[vertex] - set(tpath):
-                if next_ == goal:
-                    # add path
-                    self.path.append(tpath)
-                    # remove goal and calculate next path
-                    try:
-                        temp = self.goals.pop(0)
-                        if self.goals:
-                            # call next goal
-                            self.calculate_bfs_path(self.graph, next_,
-                                                    str(self.goals[0][0]) + "," + str(self.goals[0][1]))
-                            # free memory
-                            del temp
-                        else:
-                            # add last goal to path
-                            self.path.append([str(temp[0]) + "," + str(temp[1])])
-                    except IndexError:
-                        print("Agent: map processing error - loop detected")
-                        self.path = [[]]
-                else:
-                    queue.append((next_, tpath + [next_]))
+    # calculation of bfs path between two cells, returns the shortest list of cells from start to goal or empty list
+    # fifo queue with visited bitmap and parent pointers - every cell is expanded at most once
+    @staticmethod
+    def calculate_bfs_path(graph, start, goal):
+        return graph.breadth_first(start, goal)
 
-    # procedure responsible of calculating all possible dfs paths
+    # procedure responsible of calculating bfs path through all goals
     def get_bfs_path(self):
-        # for all permutations of goals list:
-        for self.goals in copy.deepcopy(self.goalsPer):
-            # clear bfs and run next permutation
-            self.path = []
-            # calculate bfs
-            start = str(self.x) + "," + str(self.y)
-            goal = str(self.goals[0][0]) + "," + str(self.goals[0][1])
-            self.calculate_bfs_path(self.graph, start, goal)
-            # add parsed bfs_path to solutions
-            self.solutions.append(self.parse_dfs_list(self.path))
-        # now self.solutions contains all solutions of bfs
+        self.get_ordered_path(self.calculate_bfs_path)
+        # now self.solutions contains solution of bfs
     # //////////////////////////////////////////////////
 
     # Best-First Search
 
-    # procedure responsible for calculating distance heuristics for bestfs
+    # calculation of bestfs path between two cells, returns list of cells from start to goal or empty list
+    # greedy search guided by straight-line distance to goal
     @staticmethod
-    def calculate_bestfs_distance(field, goal):
-        fieldCoord = field.split(",")
-        goalCoord = goal.split(",")
-        dist = math.sqrt(pow(int(fieldCoord[0]) - int(goalCoord[0]), 2)
-                         + pow(int(fieldCoord[1]) - int(goalCoord[1]), 2))
-        return int(dist)
-
-    # recursive calculation of bestfs path saved temporarly in self.path
-    def calculate_bestfs_path(self, graph, start, goal):
-        queue = [(self.calculate_bestfs_distance(start, goal), start, [start])]
-        heapq.heapify(queue)
-        while queue:
-            (cost, vertex, tpath) = heapq.heappop(queue)
-            heapq.heapify(queue)
-            for next_ in graph[vertex] - set(tpath):
-                if next_ == goal:
-                    # add path
-                    self.path.append(tpath)
-                    # remove goal and calculate next path
-                    try:
-                        temp = self.goals.pop(0)
-                        if self.goals:
-                            # call next goal
-                            self.calculate_bestfs_path(self.graph, next_,
-                                                       str(self.goals[0][0]) + "," + str(self.goals[0][1]))
-                            # free memory
-                            del temp
-                        else:
-                            # add last goal to path
-                            self.path.append([str(temp[0]) + "," + str(temp[1])])
-                    except IndexError:
-                        print("Agent: map processing error - loop detected")
-                        self.path = [[]]
-                else:
-                    heapq.heappush(queue, (self.calculate_bestfs_distance(next_, goal), next_, tpath + [next_]))
-                    heapq.heapify(queue)
+    def calculate_bestfs_path(graph, start, goal):
+        return graph.best_first(start, goal)
 
-    # procedure responsible of calculating all possible bestfs paths
+    # procedure responsible of calculating bestfs path through all goals
     def get_bestfs_path(self):
-        # for all permutations of goals list:
-        for self.goals in copy.deepcopy(self.goalsPer):
-            # clear bestfs_path and run next permutation
-            self.path = []
-            # calculate bestfs
-            start = str(self.x) + "," + str(self.y)
-            goal = str(self.goals[0][0]) + "," + str(self.goals[0][1])
-            self.calculate_bestfs_path(self.graph, start, goal)
-            # add parsed bestfs_path to solutions
-            self.solutions.append(self.parse_dfs_list(self.path))
-        # now self.solutions contains all solutions of bestfs
+        self.get_ordered_path(self.calculate_bestfs_path)
+        # now self.solutions contains solution of bestfs
+    # //////////////////////////////////////////////////
+
+    # A* Search
+
+    # calculation of A* path between two cells, returns the shortest list of cells from start to goal or empty list
+    # binary heap with lazy deletion of outdated entries, g-scores, closed set and manhattan heuristic
+    @staticmethod
+    def calculate_astar_path(graph, start, goal):
+        return graph.a_star(start, goal)
+
+    # procedure responsible of calculating A* path through all goals
+    def get_astar_path(self):
+        self.get_ordered_path(self.calculate_astar_path)
+        # now self.solutions contains solution of A*
+    # //////////////////////////////////////////////////
+
+    # Hierarchical A* Search
+
+    # calculation of hierarchical A* path between two cells, returns list of cells from start to goal or empty list
+    # the way is found between entrances of clusters and refined only inside of clusters on it
+    @staticmethod
+    def calculate_hpastar_path(hierarchy, start, goal):
+        return hierarchy.search(start, goal)
+
+    # procedure responsible of calculating hierarchical A* path through all goals
+    def get_hpastar_path(self):
+        self.get_ordered_path(self.calculate_hpastar_path, self.restaurant.to_hierarchical_graph())
+        # now self.solutions contains solution of hierarchical A*
+    # //////////////////////////////////////////////////
+
+    # Jump Point Search
+
+    # calculation of jump point search path between two cells, returns the shortest list of cells from start to goal
+    # or empty list - straight runs of open floor are jumped over instead of being expanded cell by cell
+    @staticmethod
+    def calculate_jps_path(graph, start, goal):
+        return graph.jump_point(start, goal)
+
+    # procedure responsible of calculating jump point search path through all goals
+    def get_jps_path(self):
+        self.get_ordered_path(self.calculate_jps_path)
+        # now self.solutions contains solution of jump point search
+    # //////////////////////////////////////////////////
+
+    # A* Search with landmarks (ALT)
+
+    # calculation of A* path between two cells guided by landmark lower bounds, returns the shortest list of cells
+    # from start to goal or empty list - landmarks are calculated once per layout of restaurant
+    @staticmethod
+    def calculate_alt_path(graph, start, goal):
+        return graph.a_star(start, goal, Landmarks.of(graph, seed=start).heuristic(goal))
+
+    # procedure responsible of calculating A* path with landmarks through all goals
+    def get_alt_path(self):
+        self.get_ordered_path(self.calculate_alt_path)
+        # now self.solutions contains solution of A* with landmarks
 
     # //////////////////////////////////////////////////
 
@@ -471,94 +689,8 @@ class Waiter (pygame.sprite.Sprite):
         with open(filename, "a") as myfile:
             myfile.write(log + '\n')
 
-    # calculate neighbourhood from matrix and coordinates of agent
-    def get_neighbourhood(self):
-        # get neighbourhood from matrix and get_coordinates of waiter:
-        shift = int((self.neighbourhood_size - 1)/2)  # coefficient of shift
-
-        # use self.get_coordinates() & self.restaurant.get_matrix() to get data required to find neighbourhood
-        # matrix = self.restaurant.get_matrix()
-        matrix = self.restaurant
-        [agent_x, agent_y] = self.get_coordinates()
-
-        # set matrix of neighbourhood - walls by default
-        self.neighbourhood = [["X" for _ in range(self.neighbourhood_size)] for _ in range(self.neighbourhood_size)]
-        self.neighbourhood[shift][shift] = "W"
-
-        # fill neighbourhood
-        for x in range(self.neighbourhood_size):
-            for y in range(self.neighbourhood_size):
-                # fill matrix of neighbourhood - NOT OPTIMAL, REPAIR: has to run through whole matrix
-                # instead of only common part of neighbourhood range and matrix
-                if agent_x + x - shift in range(0, self.n) and agent_y + y - shift in range(0, self.n):
-                    self.neighbourhood[y][x] = matrix.matrix[agent_x + x - shift][agent_y + y - shift]
-
-    def parse_neighbourhood_to_rabbit(self):
-        # get neighbourhood of agent and save it to self.neighbourhood
-        self.get_neighbourhood()
-        # parse neighbourhood to data model standard:
-        # rabbit:
-        convert = {
-            "_": 0,
-            "X": 1,
-            "F": 20,
-            "E": 21,
-            "T": 30,
-            "Y": 31,
-            "W": 4
-        }
-        rabbit_standard = ""
-        for x in range(self.neighbourhood_size):
-            for y in range(self.neighbourhood_size):
-                rabbit_standard += " {}:{}".format(str(x)+"x"+str(y), convert.get(str(self.neighbourhood[x][y])))
-        return rabbit_standard
-
-    def parse_neighbourhood_to_scikit(self):
-        # get neighbourhood of agent and save it to self.neighbourhood
-        self.get_neighbourhood()
-        # parse neighbourhood to data model standard:
-        # rabbit:
-        convert = {
-            "_": 0,
-            "X": 1,
-            "F": 20,
-            "E": 21,
-            "T": 30,
-            "Y": 31,
-            "W": 4
-        }
-        scikit_standard = ""
-        for x in range(self.neighbourhood_size):
-            for y in range(self.neighbourhood_size):
-                scikit_standard += "{}, ".format(convert.get(str(self.neighbourhood[x][y])))
-        return scikit_standard
-
-    def parse_neighbourhood_to_scikit_SVM(self):
-        # get neighbourhood of agent and save it to self.neighbourhood
-        self.get_neighbourhood()
-        # parse neighbourhood to data model standard:
-        # rabbit:
-        convert = {
-            "_": 0,
-            "X": 0.9,
-            "F": 0.20,
-            "E": 0.9,
-            "T": 0.30,
-            "Y": 0.9,
-            "W": 0.4
-        }
-
-        svm_standard = ndarray(shape=(1, self.neighbourhood_size, self.neighbourhood_size), dtype=float)
-        for index_x, x in enumerate(self.neighbourhood_size):
-            for index_y, y in enumerate(self.neighbourhood_size):
-                svm_standard[0][index_x][index_y] = convert.get(str(self.neighbourhood[index_x][index_y]))
-        nsamples, nx, ny = svm_standard
-        svm_standard = svm_standard.reshape((nsamples, nx * ny))
-        return svm_standard
-
-    # method used only in model generation, called in UberKelner.py ONLY
-    def parse_neighbourhood_to_model(self):
-        # parse neighbourhood to rabbit string
+    # lines of data models (rabbit and scikit) for current neighbourhood and the next move of path
+    def model_sample(self):
         moves = {
             "[0, -1]": "W",
             "[0, 1]": "S",
@@ -568,159 +700,75 @@ class Waiter (pygame.sprite.Sprite):
         # there has to be run self.solve("depthfs") before this part, otherwise self.path will be empty
         predicted_move = moves.get(str([self.path[0][0], self.path[0][1]]))  # returns value from "moves"
 
-        rabbit_standard = "{} | ".format(predicted_move)
-        rabbit_standard = rabbit_standard + self.parse_neighbourhood_to_rabbit()
+        # neighbourhood AND movement solution according to the standard set in
+        # documentation/unsupervised_learning.txt - values of data models are not scaled
+        row = self.encoder.encode(self.restaurant, [(self.x, self.y)], scale=1)[0]
+        rabbit_standard = "{} {}".format(predicted_move, self.encoder.example(row))
+        scikit_standard = "{}, {}".format(predicted_move, self.encoder.sample(row))
+        return rabbit_standard, scikit_standard
 
-        # save neighbourhood AND movement solution to data model for rabbit
-        # according to the standard set in documentation/unsupervised_learning.txt
+    # method used only in model generation
+    def parse_neighbourhood_to_model(self):
+        rabbit_standard, scikit_standard = self.model_sample()
+        # save neighbourhood with movement solution to data models
         self.save(path.join('data', 'datamodel_rabbit.txt'), rabbit_standard)
-
-        # save neighbourhood to data model for scikit
-        scikit_standard = "{}, ".format(predicted_move)
-        scikit_standard = scikit_standard + self.parse_neighbourhood_to_scikit()
         self.save(path.join('data', 'datamodel_scikit.txt'), scikit_standard)
 
+    # samples of data models (pairs of rabbit and scikit lines) of the whole simulation of scenario
+    # (n, num_tables, num_furnaces, num_walls, coordinates) - every move of waiter solving it with solving_method,
+    # used in model generation (see scripts/dataset.py), so it can run in any process
+    @staticmethod
+    def model_samples(scenario, solving_method, ordering="exact", budget=1.0, cache=None):
+        n, num_tables, num_furnaces, num_walls, coordinates = scenario
+        uber = Waiter(n, coordinates, num_tables, num_furnaces, num_walls, solving_method, ordering, budget, cache)
+        samples = []
+        try:
+            while uber.path:
+                samples.append(uber.model_sample())
+                # move agent on path
+                uber.next_round(K_SPACE)
+        finally:
+            uber.close()
+        return samples
+
     # //////////////////////////////////////////////////
 
     # Rabbit Search - Adam Lewicki & Julia Maria May
 
-    def get_rabbit_path(self):
-        # get neighbourhood in rabbit
-        rabbit_standard = self.parse_neighbourhood_to_rabbit()
-        # get proposed solution of current state from model
-
-        moves = {
-            1: [0, -1],
-            2: [0, 1],
-            3: [-1, 0],
-            4: [1, 0],
-        }
+    # procedure running in init of agent, starting predictor of model once - examples of all moves
+    # are streamed to the same predictor
+    def init_rabbit(self):
+        self.rabbit = Rabbit(path.join('data', 'rabbit.model'))
 
-        model = './data/rabbit.model'
-        input = './data/rabbit_input.txt'
-        output = './data/rabbit_result.txt'
-
-        rabbit_standard = "|{}".format(rabbit_standard)
-
-        with open(input, 'w') as myfile:
-            myfile.write(rabbit_standard)
-
-        run_rabbit = 'vw -i {} -t {} -p {} --quiet'.format(model, input, output)
-        os.system(run_rabbit)
-
-        with open(output, 'r') as myfile:
-            result = int(round(float(myfile.readline())))
-        result = moves.get(result)
-        print(result)
-
-        # set response to path
-        self.path.clear()
-        self.path.append(result)
+    # stop predictor of model - vw process does not outlive the waiter
+    def close(self):
+        if self.rabbit is not None:
+            self.rabbit.close()
+            self.rabbit = None
 
     # //////////////////////////////////////////////////////
 
     # SciKit Support Vector Machines Search - Marcin Drzewiczak
 
-    # procedure running in init of agent, loading data to model once
+    # procedure running in init of agent, choosing estimator - it is fitted (or loaded from model store)
+    # on the first prediction
     def init_svm(self):
-        self.svm_target = numpy.load(path.join('data', 'svm_target.npy'))
-        self.svm_data = numpy.load(path.join('data', 'svm_data.npy'))
-        nsamples, nx, ny = self.svm_data.shape
-        self.svm_data = self.svm_data.reshape((nsamples, nx * ny))
-        # self.svm_data = list(self.svm_data)
-        self.clf = svm.SVC(gamma='scale', C=100)
-        self.clf.fit(self.svm_data, self.svm_target)
+        self.estimator = svm.SVC(gamma='scale', C=100)
+        self.clf = None
 
     def init_dtree(self):
-        self.svm_target = numpy.load(path.join('data', 'svm_target.npy'))
-        self.svm_data = numpy.load(path.join('data', 'svm_data.npy'))
-        nsamples, nx, ny = self.svm_data.shape
-        self.svm_data = self.svm_data.reshape((nsamples, nx * ny))
-        # self.svm_data = list(self.svm_data)
-        self.clf = tree.DecisionTreeClassifier()
-        self.clf.fit(self.svm_data, self.svm_target)
-
-    def scikit_standard_to_svm_standard(self, scikit_standard):
-        try:
-            scikit_standard = scikit_standard.split(', ')
-            scikit_standard.pop()
-        except:
-            pass
-        scikit_standard = list(map(int, scikit_standard))
-        scikit_standard = list(map(lambda a: a/100, scikit_standard))
-
-        iter = 0
-        svm_standard = ndarray(shape=(self.neighbourhood_size, self.neighbourhood_size), dtype=float)
-        for x in range(self.neighbourhood_size):
-            for y in range(self.neighbourhood_size):
-                svm_standard[x][y] = scikit_standard[iter]
-                iter += 1
-        to_return = ndarray(shape=(1, 25), dtype=ndarray)
-        to_return[0] = svm_standard.flatten()
-        return to_return
-
-    def get_svm_path(self):
-        # get neighbourhood in scikit
-        scikit_standard = self.parse_neighbourhood_to_scikit()
-        svm_standard = self.scikit_standard_to_svm_standard(scikit_standard)
-        # get proposed solution of current state from model
-
-        # print(self.svm_data.ndim)
-        # print(self.svm_data.shape)
-        # print(svm_standard.shape)
-
-        prediction = self.clf.predict(svm_standard)
-        moves = {
-            'W': [0, -1],
-            'S': [0, 1],
-            'A': [-1, 0],
-            'D': [1, 0],
-        }
-        # print(prediction)
-        move_to_append = moves.get(prediction[0])
-        # set response to path
-        # this has to be double list!
-        self.path.clear()
-        self.path.append(move_to_append)
-
-    # //////////////////////////////////////////////////////
-
-    # SciKit Logistic Regression Search - Michał Kubiak
-
-    def get_logistic_regression_path(self):
-        # get neighbourhood in scikit
-        scikit_standard = self.parse_neighbourhood_to_scikit()
-        # get proposed solution of current state from model
-
-        # set response to path
-        self.path = [[0, 0]]  # this has to be double list!
-
-    # //////////////////////////////////////////////////////
-
-    # SciKit Decision-Tree Search - Przemysław Owczar XD
-
-    def get_decision_tree_path(self):
-        # get neighbourhood in scikit
-        scikit_standard = self.parse_neighbourhood_to_scikit()
-        svm_standard = self.scikit_standard_to_svm_standard(scikit_standard)
-        # get proposed solution of current state from model
-
-        # print(self.svm_data.ndim)
-        # print(self.svm_data.shape)
-        # print(svm_standard.shape)
-
-        prediction = self.clf.predict(svm_standard)
-        moves = {
-            'W': [0, -1],
-            'S': [0, 1],
-            'A': [-1, 0],
-            'D': [1, 0],
-        }
-        # print(prediction)
-        move_to_append = moves.get(prediction[0])
-        # set response to path
-        # this has to be double list!
-        self.path.clear()
-        self.path.append(move_to_append)
+        self.estimator = tree.DecisionTreeClassifier()
+        self.clf = None
+
+    # fitted estimator - training data are loaded once and the estimator is fitted only if model store
+    # does not know it yet (waiters of the same process share one instance)
+    def classifier(self):
+        if self.clf is None:
+            self.svm_target = numpy.load(path.join('data', 'svm_target.npy'))
+            self.svm_data = numpy.load(path.join('data', 'svm_data.npy'))
+            nsamples, nx, ny = self.svm_data.shape
+            self.svm_data = self.svm_data.reshape((nsamples, nx * ny))
+            self.clf = ModelStore(path.join('data', 'models')).fit(self.estimator, self.svm_data, self.svm_target)
+        return self.clf
 
     # //////////////////////////////////////////////////////